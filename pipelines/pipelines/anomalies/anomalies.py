@@ -1,37 +1,93 @@
-from os.path import exists, join
+import argparse
+from os.path import basename, dirname, exists, join, splitext
+from typing import Optional
 
 import pandas as pd
 
+from ..features.event_count_matrix import (
+    read_sparse_event_count_matrix,
+    sparse_matrix_files,
+)
+from ..utils.artifacts import ArtifactManifest
 from ..utils.functions import (
     dataset_to_csv,
     get_all_files_recursively,
     get_dataset_name,
 )
-from .pca import pca_subspace_anomaly_detection
+from .pca import pca_subspace_anomaly_detection, sparse_pca_subspace_anomaly_detection
 
 RESULTS_DIR = join("results", "anomalies")
 INPUT_DIR = join("results", "features")
+VARIANCE_THRESHOLD = 0.85
+ALPHA = 0.1
+
+
+def get_parser():
+    """PCA-based anomaly detection on event count matrices."""
+    parser = argparse.ArgumentParser(description=get_parser.__doc__)
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Detect anomalies of all matrices - even the up-to-date ones (see `artifacts`).",
+    )
+
+    return parser
 
 
-def main():
+def main(args: Optional[argparse.Namespace] = None):
+    if not args:
+        args = get_parser().parse_args()
+
+    manifest = ArtifactManifest(RESULTS_DIR)
+    parameters = {"variance_threshold": VARIANCE_THRESHOLD, "alpha": ALPHA}
+
     for input_file in get_all_files_recursively(INPUT_DIR):
         dataset_name = get_dataset_name(input_file)
-        input_file = join(INPUT_DIR, dataset_name, f"{dataset_name}.csv")
+        # Windows and events of sparse matrices (`_rows.csv`, `_columns.csv`) are read with them,
+        # manifests aren't matrices.
+        if basename(dirname(input_file)) != dataset_name:
+            continue
+
+        sparse = splitext(input_file)[1] == ".npz"
+        if not sparse:
+            input_file = join(INPUT_DIR, dataset_name, f"{dataset_name}.csv")
 
-        if not exists(input_file):
-            raise ValueError(f"Event count matrix `{input_file}` doesn't exist!")
+            if not exists(input_file):
+                raise ValueError(f"Event count matrix `{input_file}` doesn't exist!")
 
-        event_count_matrix = pd.read_csv(input_file, index_col=0)
+        input_files = sparse_matrix_files(input_file) if sparse else [input_file]
+        if not args.force and manifest.is_up_to_date(
+            dataset_name, input_files, parameters
+        ):
+            print(f"Anomalies of `{dataset_name}` are up to date")
+            continue
 
-        pca_anomalies_df = pca_subspace_anomaly_detection(
-            event_count_matrix,
-            variance_threshold=0.85,
-            alpha=0.1,
+        if sparse:
+            # Read, and detected, without densifying.
+            pca_anomalies_df = sparse_pca_subspace_anomaly_detection(
+                read_sparse_event_count_matrix(input_file),
+                variance_threshold=VARIANCE_THRESHOLD,
+                alpha=ALPHA,
+            )
+        else:
+            event_count_matrix = pd.read_csv(input_file, index_col=0)
+
+            pca_anomalies_df = pca_subspace_anomaly_detection(
+                event_count_matrix,
+                variance_threshold=VARIANCE_THRESHOLD,
+                alpha=ALPHA,
+            )
+        result_file = dataset_to_csv(
+            pca_anomalies_df, RESULTS_DIR, f"{dataset_name}_pca"
         )
-        dataset_name = f"{dataset_name}_pca"
-        dataset_to_csv(pca_anomalies_df, RESULTS_DIR, dataset_name)
+        manifest.record(dataset_name, input_files, parameters, [result_file])
+
+        print(f"Anomalies detection executed for `{dataset_name}_pca`")
 
-        print(f"Anomalies detection executed for `{dataset_name}`")
+    # Results of matrices no longer produced by features aren't plotted.
+    for dataset_name in manifest.prune():
+        print(f"Stale anomalies of `{dataset_name}` removed")
 
 
 if __name__ == "__main__":
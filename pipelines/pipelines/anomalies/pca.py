@@ -5,6 +5,8 @@ from sklearn.decomposition import PCA
 from sklearn.feature_extraction.text import TfidfTransformer
 from sklearn.preprocessing import StandardScaler
 
+from ..features.event_count_matrix import SparseEventCountMatrix
+
 
 def pca_subspace_anomaly_detection(
     event_matrix: pd.DataFrame, variance_threshold: float = 0.95, alpha: float = 0.001
@@ -71,3 +73,63 @@ def pca_subspace_anomaly_detection(
     event_matrix["IsAnomaly"] = event_matrix["AnomalyScore"] > Q_alpha
 
     return event_matrix
+
+
+def sparse_pca_subspace_anomaly_detection(
+    ecm: SparseEventCountMatrix,
+    variance_threshold: float = 0.95,
+    alpha: float = 0.001,
+) -> pd.DataFrame:
+    """
+    Applies PCA-based subspace anomaly detection (see `pca_subspace_anomaly_detection`) on a
+    sparse event count matrix, without densifying it:
+        - the TF-IDF weighted matrix is scaled to unit variance, but not centered - PCA (on the
+          covariance matrix, events x events) centers it implicitly;
+        - SPE is computed from the norm and the principal component projection of the centered
+          rows, `‖y - m‖^2 - ‖P^T (y - m)‖^2`, expanded into sparse products.
+
+    Args:
+        ecm (SparseEventCountMatrix): The sparse event count matrix.
+        variance_threshold (float): The percentage of variance to preserve (default 95%).
+        alpha (float): The significance level for anomaly detection (default 0.001).
+
+    Returns:
+        pd.DataFrame: 'AnomalyScore' and 'IsAnomaly' columns, by window.
+    """
+    tfidf_transformer = TfidfTransformer(
+        norm="l2",
+        use_idf=True,
+        smooth_idf=True,
+    )
+    event_counts = tfidf_transformer.fit_transform(ecm.matrix.astype(np.float64))
+
+    # Unit variance only - centering would make the matrix dense.
+    scaler = StandardScaler(with_mean=False)
+    event_counts_scaled = scaler.fit_transform(event_counts).tocsr()
+
+    pca = PCA(n_components=variance_threshold, svd_solver="covariance_eigh")
+    principal_components = pca.fit(event_counts_scaled)
+    k = principal_components.n_components_
+
+    P = principal_components.components_.T
+    mean = principal_components.mean_
+
+    # ‖y - m‖^2 = ‖y‖^2 - 2 y·m + ‖m‖^2
+    squared_norms = (
+        np.asarray(
+            event_counts_scaled.multiply(event_counts_scaled).sum(axis=1)
+        ).ravel()
+        - 2 * (event_counts_scaled @ mean)
+        + mean @ mean
+    )
+    # P^T (y - m) = P^T y - P^T m
+    projections = event_counts_scaled @ P - mean @ P
+    squared_prediction_error = squared_norms - np.sum(projections**2, axis=1)
+
+    Q_alpha = chi2.ppf(1 - alpha, df=event_counts_scaled.shape[1] - k)
+
+    anomalies_df = pd.DataFrame(index=ecm.windows)
+    anomalies_df["AnomalyScore"] = squared_prediction_error
+    anomalies_df["IsAnomaly"] = anomalies_df["AnomalyScore"] > Q_alpha
+
+    return anomalies_df
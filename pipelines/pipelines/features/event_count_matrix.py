@@ -1,29 +1,158 @@
+import os
+from dataclasses import dataclass
+from os.path import join, splitext
+from typing import Optional
+
+import numpy as np
 import pandas as pd
+from scipy import sparse
+
+
+@dataclass
+class SparseEventCountMatrix:
+    # Rows = windows, columns = events.
+    matrix: sparse.csr_matrix
+    windows: pd.Index
+    events: pd.Index
 
+    def to_dense(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            self.matrix.toarray(), index=self.windows, columns=self.events
+        )
 
-def event_count_matrix(data: pd.DataFrame) -> pd.DataFrame:
+
+def get_event_column(data: pd.DataFrame, event_column: Optional[str] = None) -> str:
+    """
+    Column identifying events - `event_column`, if given, otherwise 'EventId' (integer ids of
+    Drain3 output with the `ids` encoding), if present, otherwise 'EventTemplate'.
     """
-    Generates an event count matrix based on EventTemplate occurrences per window.
+    if event_column is None:
+        event_column = "EventId" if "EventId" in data.columns else "EventTemplate"
+
+    if event_column not in data.columns:
+        raise ValueError(
+            f"The input DataFrame must contain an '{event_column}' column."
+        )
+
+    return event_column
+
+
+def _event_counts(data: pd.DataFrame, event_column: Optional[str]) -> pd.DataFrame:
+    """Window, event and count rows - counted windows (with a 'Count' column) as they are."""
+    event_column = get_event_column(data, event_column)
+
+    if "Count" in data.columns:
+        return data[["Window", event_column, "Count"]]
+
+    data = data[["Window", event_column]].explode(event_column)
+    # Exploded lists are `object` columns - integer ids group much faster as integers.
+    data[event_column] = data[event_column].infer_objects()
+    data["Count"] = 1
+    return data
+
+
+def event_count_matrix(
+    data: pd.DataFrame, event_column: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Generates an event count matrix based on event occurrences per window.
     Windows can be created using different strategies:
         - Fixed time window;
         - Sliding time window;
         - Session (ID-based) window.
 
     Args:
-        data (pd.DataFrame): Input DataFrame with columns 'Window' and 'EventTemplate'.
+        data (pd.DataFrame): Input DataFrame with columns 'Window' and 'EventId' or 'EventTemplate'
+            (lists of events per window), or counted windows - 'Window', event and 'Count' rows.
+        event_column (Optional[str]): Column identifying events - see `get_event_column`.
 
     Returns:
-        pd.DataFrame: Event count matrix (rows = time windows, columns = event templates).
+        pd.DataFrame: Event count matrix (rows = time windows, columns = events).
     """
-    if "EventTemplate" not in data.columns:
-        raise ValueError("The input DataFrame must contain an 'EventTemplate' column.")
-
-    data = data.explode("EventTemplate")
+    data = _event_counts(data, event_column)
 
     event_count_df = (
-        data.groupby(["Window", "EventTemplate"])
-        .size()
+        data.groupby(["Window", data.columns[1]])["Count"]
+        .sum()
         .unstack(fill_value=0)  # Convert grouped counts into a pivot table
     )
 
     return event_count_df
+
+
+def sparse_event_count_matrix(
+    data: pd.DataFrame, event_column: Optional[str] = None
+) -> SparseEventCountMatrix:
+    """
+    Generates the event count matrix of `event_count_matrix` as a CSR matrix - only the counts
+    of events occurring in a window are stored, never the (mostly zero) dense matrix.
+
+    Windows and events are factorized to (sorted) row and column codes, and the counts of their
+    pairs are summed by the COO -> CSR conversion - rows and columns are in the same order as
+    the dense matrix's.
+
+    Args:
+        data (pd.DataFrame): Input DataFrame - see `event_count_matrix`.
+        event_column (Optional[str]): Column identifying events - see `get_event_column`.
+
+    Returns:
+        SparseEventCountMatrix: Event count matrix with its windows (rows) and events (columns).
+    """
+    data = _event_counts(data, event_column)
+    # Windows without events (empty lists) have no row, as in the dense matrix.
+    data = data.dropna(subset=[data.columns[1]])
+
+    rows, windows = pd.factorize(data["Window"], sort=True)
+    columns, events = pd.factorize(data[data.columns[1]], sort=True)
+
+    matrix = sparse.coo_matrix(
+        (data["Count"].to_numpy(dtype=np.int64), (rows, columns)),
+        shape=(len(windows), len(events)),
+    ).tocsr()
+
+    return SparseEventCountMatrix(
+        matrix,
+        pd.Index(windows, name="Window"),
+        pd.Index(events, name=data.columns[1]),
+    )
+
+
+def _index_files(npz_file: str) -> tuple[str, str]:
+    base = splitext(npz_file)[0]
+    return f"{base}_rows.csv", f"{base}_columns.csv"
+
+
+def sparse_dataset_to_npz(
+    ecm: SparseEventCountMatrix, results_dir: str, dataset_name: str
+) -> list[str]:
+    """
+    Saves a sparse event count matrix as `<dataset_name>.npz`, with its windows and events in
+    `<dataset_name>_rows.csv` and `<dataset_name>_columns.csv` - see `dataset_to_csv`.
+    """
+    features_results_dir = join(results_dir, dataset_name)
+    os.makedirs(features_results_dir, exist_ok=True)
+
+    npz_file = join(features_results_dir, f"{dataset_name}.npz")
+    rows_file, columns_file = _index_files(npz_file)
+    sparse.save_npz(npz_file, ecm.matrix)
+    ecm.windows.to_frame().to_csv(rows_file, index=False)
+    ecm.events.to_frame().to_csv(columns_file, index=False)
+    return sparse_matrix_files(npz_file)
+
+
+def sparse_matrix_files(npz_file: str) -> list[str]:
+    """Files of a sparse event count matrix - the matrix, its windows and events."""
+    return [npz_file, *_index_files(npz_file)]
+
+
+def read_sparse_event_count_matrix(npz_file: str) -> SparseEventCountMatrix:
+    """Reads a sparse event count matrix saved by `sparse_dataset_to_npz`."""
+    rows_file, columns_file = _index_files(npz_file)
+    rows = pd.read_csv(rows_file)
+    columns = pd.read_csv(columns_file)
+
+    return SparseEventCountMatrix(
+        sparse.load_npz(npz_file).tocsr(),
+        pd.Index(rows.iloc[:, 0], name=rows.columns[0]),
+        pd.Index(columns.iloc[:, 0], name=columns.columns[0]),
+    )
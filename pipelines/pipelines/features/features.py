@@ -1,24 +1,91 @@
+import argparse
 from os.path import exists, join
+from typing import Optional
 
 import pandas as pd
 
+from ..utils.artifacts import ArtifactManifest
 from ..utils.functions import (
     dataset_to_csv,
     get_all_files_recursively,
     get_dataset_name,
+    read_structured,
+    structured_chunk_generator,
+    structured_columns,
+)
+from .event_count_matrix import (
+    event_count_matrix,
+    get_event_column,
+    sparse_dataset_to_npz,
+    sparse_event_count_matrix,
+)
+from .windowing import (
+    HDFS_BLOCK_ID,
+    chunked_fixed_time_window,
+    fixed_time_window,
+    fixed_time_window_pyramid,
+    session_ids,
+    session_window,
+    sliding_time_window,
+    window_pyramid,
 )
-from .event_count_matrix import event_count_matrix
-from .windowing import fixed_time_window
 
 RESULTS_DIR = join("results", "features")
 INPUT_DIR = join("results", "parsing")
+WINDOW_SIZE = "5min"
+SLIDING_STEP = "1min"
+# Patterns of session ids in the contents of logs, by dataset (name prefix) - session window event
+# count matrices are created for these, too.
+SESSION_ID_PATTERNS: dict[str, str] = {"HDFS": HDFS_BLOCK_ID}
 INPUT_FILES: list[tuple[str, str, str]] = [
     ("drain/loghub_2k/Apache_2k_structured.csv", "Time", r"%a %b %d %H:%M:%S %Y"),
     # ("drain3/", "Time", r"%a %b %d %H:%M:%S %Y"),
 ]  # TODO: This shouldn't exist, should be replaced with get_all_files_recursively(INPUT_DIR) - ISO8601 Timestamp!
 
 
-def main():
+def get_parser():
+    """Event count matrix features."""
+    parser = argparse.ArgumentParser(description=get_parser.__doc__)
+
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        help="Save event count matrices as sparse (CSR) `.npz` matrices, with their windows "
+        + "and events in `_rows.csv` and `_columns.csv` files.",
+    )
+
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Read structured logs in chunks of this many rows, keeping only window counts "
+        + "across them - fixed windows only (all logs are read at once, by default).",
+    )
+
+    parser.add_argument(
+        "--pyramid",
+        nargs="+",
+        metavar="WINDOW_SIZE",
+        default=None,
+        help="Fixed window sizes (e.g. `1min 5min 15min 1h`, multiples of the finest) to create "
+        + "event count matrices of, in one pass - instead of the 5min fixed and sliding ones.",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Create features of all datasets - even the up-to-date ones (see `artifacts`).",
+    )
+
+    return parser
+
+
+def main(args: Optional[argparse.Namespace] = None):
+    if not args:
+        args = get_parser().parse_args()
+
+    manifest = ArtifactManifest(RESULTS_DIR)
+
     for input_file, timestamp_label, timestamp_format in INPUT_FILES:
         dataset_name = get_dataset_name(input_file)
         input_file = join(
@@ -28,21 +95,125 @@ def main():
         if not exists(input_file):
             raise ValueError(f"Structured log file `{input_file}` doesn't exist!")
 
-        df = pd.read_csv(input_file)
+        # Only the columns windowing and the event count matrix need - `EventId`s of the `ids`
+        # encoding of Drain3 output (which has no `EventTemplate`s), if present.
+        header = structured_columns(input_file)
+        event_column = get_event_column(pd.DataFrame(columns=header))
+        columns = [timestamp_label, event_column]
+
+        # Sessions span the whole log - only when all logs are read at once. Drain3 output has
+        # no `Content` (it's replaced by the template and parameters) to find session ids in.
+        session_id_pattern = SESSION_ID_PATTERNS.get(dataset_name.split("_")[0])
+        if session_id_pattern and "Content" in header and not (
+            args.pyramid or args.chunk_size
+        ):
+            columns.append("Content")
+        else:
+            session_id_pattern = None
+
+        # Chunk size only changes how logs are read - chunked or not is what changes outputs.
+        parameters = {
+            "columns": columns,
+            "timestamp_format": timestamp_format,
+            "window_size": WINDOW_SIZE,
+            "sliding_step": SLIDING_STEP,
+            "session_id_pattern": session_id_pattern,
+            "pyramid": args.pyramid,
+            "chunked": bool(args.chunk_size),
+            "sparse": args.sparse,
+        }
+        if not args.force and manifest.is_up_to_date(
+            dataset_name, [input_file], parameters
+        ):
+            print(f"Features of `{dataset_name}` are up to date")
+            continue
+
+        if args.pyramid:
+            if args.chunk_size:
+                finest_window_df = chunked_fixed_time_window(
+                    structured_chunk_generator(input_file, columns, args.chunk_size),
+                    timestamp_label,
+                    timestamp_format,
+                    window_size=min(args.pyramid, key=pd.Timedelta),
+                )
+                levels = window_pyramid(finest_window_df, args.pyramid)
+            else:
+                levels = fixed_time_window_pyramid(
+                    read_structured(input_file, columns=columns),
+                    timestamp_label,
+                    timestamp_format,
+                    args.pyramid,
+                )
+            windowed_dfs = [
+                (f"ecm{window_size}", level) for window_size, level in levels.items()
+            ]
+        elif args.chunk_size:
+            # Sliding windows sweep all events in time order - only fixed ones are chunked.
+            windowed_dfs = [
+                (
+                    "ecmfixed",
+                    chunked_fixed_time_window(
+                        structured_chunk_generator(
+                            input_file, columns, args.chunk_size
+                        ),
+                        timestamp_label,
+                        timestamp_format,
+                        window_size=WINDOW_SIZE,
+                    ),
+                )
+            ]
+        else:
+            df = read_structured(input_file, columns=columns)
+
+            fixed_window_df = fixed_time_window(
+                df,
+                timestamp_label,
+                timestamp_format,
+                window_size=WINDOW_SIZE,
+            )
+
+            sliding_window_df = sliding_time_window(
+                df,
+                timestamp_label,
+                timestamp_format,
+                window_size=WINDOW_SIZE,
+                step=SLIDING_STEP,
+            )
+
+            windowed_dfs = [
+                ("ecmfixed", fixed_window_df),
+                ("ecmsliding", sliding_window_df),
+            ]
+
+            if session_id_pattern:
+                df["SessionId"] = session_ids(df, "Content", session_id_pattern)
+                windowed_dfs.append(
+                    (
+                        "ecmsession",
+                        session_window(df, "SessionId", event_column=event_column),
+                    )
+                )
+
+        output_files = []
+        for suffix, windowed_df in windowed_dfs:
+            ecm_dataset_name = f"{dataset_name}_{suffix}"
+            if args.sparse:
+                output_files += sparse_dataset_to_npz(
+                    sparse_event_count_matrix(windowed_df),
+                    RESULTS_DIR,
+                    ecm_dataset_name,
+                )
+            else:
+                ecm = event_count_matrix(windowed_df)
+                output_files.append(dataset_to_csv(ecm, RESULTS_DIR, ecm_dataset_name))
 
-        fixed_window_df = fixed_time_window(
-            df,
-            timestamp_label,
-            timestamp_format,
-            window_size="5min",
-        )
+            print(f"Features created for `{ecm_dataset_name}`")
 
-        # TODO: Add sliding and session windows.
-        ecm_fixed_window = event_count_matrix(fixed_window_df)
-        dataset_name = f"{dataset_name}_ecmfixed"
-        dataset_to_csv(ecm_fixed_window, RESULTS_DIR, dataset_name)
+        manifest.record(dataset_name, [input_file], parameters, output_files)
 
-        print(f"Features created for `{dataset_name}`")
+    # Matrices this run didn't produce (e.g. of other windows) aren't picked up by anomalies.
+    for dataset_name in manifest.prune():
+        print(f"Stale features of `{dataset_name}` removed")
 
 
 if __name__ == "__main__":
@@ -1,13 +1,55 @@
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
 from warnings import warn
 
+import numpy as np
 import pandas as pd
 
+from .event_count_matrix import get_event_column
+
 warn(
     "In the collection stage - make formats, and labels uniform, so that additional "
     + "parameters (such as `timestamp_label` and `timestamp_format` can be excluded from "
     + "the pipeline (dataflow) code."
 )
 
+# Block ids of HDFS logs - the session ids of HDFS anomaly labels.
+HDFS_BLOCK_ID = r"blk_-?\d+"
+
+
+def _to_datetime(
+    data: pd.DataFrame, timestamp_label: str, timestamp_format: Optional[str]
+) -> pd.Series:
+    if pd.api.types.is_integer_dtype(data[timestamp_label]):
+        # Columnar (Parquet) results store nanoseconds since epoch.
+        return pd.to_datetime(data[timestamp_label], unit="ns")
+    if not pd.api.types.is_datetime64_any_dtype(data[timestamp_label]):
+        return pd.to_datetime(data[timestamp_label], format=timestamp_format)
+    return data[timestamp_label]
+
+
+def _window_starts(windows: np.ndarray, tz: Any) -> pd.DatetimeIndex:
+    window_starts = pd.to_datetime(np.asarray(windows, dtype=np.int64), unit="ns")
+    if tz is not None:
+        window_starts = window_starts.tz_localize("UTC").tz_convert(tz)
+    return window_starts
+
+
+def _counted_windows(
+    windows: list,
+    codes: list[int],
+    counts: list[int],
+    events: pd.Index,
+    event_column: str,
+) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Window": windows,
+            event_column: events.take(np.asarray(codes, dtype=np.int64)),
+            "Count": np.asarray(counts, dtype=np.int64),
+        }
+    )
+
 
 def fixed_time_window(
     data: pd.DataFrame,
@@ -21,17 +63,372 @@ def fixed_time_window(
     Args:
         data (pd.DataFrame): Input DataFrame containing a timestamp column.
         timestamp_label (str): Name of the timestamp column.
-        timestamp_format (str): Format of the timestamp (if not already datetime).
+        timestamp_format (str): Format of the timestamp (if not already datetime or epoch-ns integer).
         window_size (str): Pandas time frequency string (e.g., '1Min', '30S', '5Min').
 
     Returns:
         pd.DataFrame: DataFrame grouped by fixed time windows.
     """
-    if not pd.api.types.is_datetime64_any_dtype(data[timestamp_label]):
-        data[timestamp_label] = pd.to_datetime(
-            data[timestamp_label], format=timestamp_format
-        )
+    data[timestamp_label] = _to_datetime(data, timestamp_label, timestamp_format)
 
     data["Window"] = data[timestamp_label].dt.floor(window_size)
 
     return data.groupby("Window").agg(list).reset_index()
+
+
+def chunked_fixed_time_window(
+    chunks: Iterable[pd.DataFrame],
+    timestamp_label: str,
+    timestamp_format: str,
+    window_size: str,
+    event_column: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Counts events in fixed-size time windows (see `fixed_time_window`) of chunks of logs (e.g.
+    `structured_chunk_generator`) - only (window, event) counts are kept across chunks, never
+    the logs.
+
+    Once logs are in time order, the windows before the last one of a chunk are complete - their
+    counts are set aside, and only the last window's (spanning into the next chunk) are summed
+    with the next chunk's. Late (out of order) logs count in their windows again, and
+    `event_count_matrix` sums the counts.
+
+    Args:
+        chunks (Iterable[pd.DataFrame]): Chunks containing a timestamp and an event column.
+        timestamp_label (str): Name of the timestamp column.
+        timestamp_format (str): Format of the timestamp (if not already datetime or epoch-ns integer).
+        window_size (str): Pandas time frequency string (e.g., '1Min', '30S', '5Min').
+        event_column (Optional[str]): Column identifying events - see `get_event_column`.
+
+    Returns:
+        pd.DataFrame: Counted windows - 'Window' (start), event and 'Count' rows, for
+            `event_count_matrix`.
+    """
+    open_counts: Optional[pd.Series] = None
+    complete_counts: list[pd.Series] = []
+
+    for chunk in chunks:
+        column = get_event_column(chunk, event_column)
+        windows = (
+            _to_datetime(chunk, timestamp_label, timestamp_format)
+            .dt.floor(window_size)
+            .rename("Window")
+        )
+        events = chunk[column]
+        if isinstance(events.dtype, pd.CategoricalDtype):
+            # Dictionary-encoded (Parquet) columns - categories differ between chunks.
+            events = events.astype(events.cat.categories.dtype)
+        counts = chunk.groupby([windows, events]).size()
+        if open_counts is not None:
+            counts = pd.concat([open_counts, counts]).groupby(level=[0, 1]).sum()
+        if counts.empty:
+            continue
+
+        complete = counts.index.get_level_values("Window") < windows.max()
+        complete_counts.append(counts[complete])
+        open_counts = counts[~complete]
+
+    if open_counts is not None:
+        complete_counts.append(open_counts)
+    if not complete_counts:
+        return pd.DataFrame(
+            columns=["Window", event_column or "EventTemplate", "Count"]
+        )
+
+    return pd.concat(complete_counts).rename("Count").reset_index()
+
+
+def _pyramid_sizes(window_sizes: Iterable[str]) -> dict[str, int]:
+    """Window sizes (in ns), finest first - each a multiple of the finest, to roll up into."""
+    sizes = sorted(
+        (
+            (window_size, pd.Timedelta(window_size).value)
+            for window_size in window_sizes
+        ),
+        key=lambda item: item[1],
+    )
+    if not sizes or sizes[0][1] <= 0:
+        raise ValueError("Window sizes must be positive.")
+    for window_size, size in sizes:
+        if size % sizes[0][1]:
+            raise ValueError(
+                f"Window size '{window_size}' isn't a multiple of the finest, '{sizes[0][0]}'."
+            )
+    return dict(sizes)
+
+
+def _roll_up(
+    counts: pd.Series, sizes: dict[str, int], tz: Any
+) -> dict[str, pd.DataFrame]:
+    """
+    Rolls (window start in ns, event) counts up into every window size - each from the coarsest
+    size (already rolled up) it's a multiple of, the previous one, usually.
+    """
+    levels: dict[str, pd.DataFrame] = {}
+    rolled: list[tuple[int, pd.Series]] = []
+
+    for window_size, size in sizes.items():
+        source = counts
+        for source_size, source_counts in reversed(rolled):
+            if size % source_size == 0:
+                source = source_counts
+                break
+
+        windows = source.index.get_level_values(0).to_numpy() // size * size
+        source = source.groupby([windows, source.index.get_level_values(1)]).sum()
+        rolled.append((size, source))
+
+        level = source.rename("Count").reset_index()
+        level.columns = ["Window", counts.index.names[1], "Count"]
+        level["Window"] = _window_starts(level["Window"].to_numpy(), tz)
+        levels[window_size] = level
+
+    return levels
+
+
+def fixed_time_window_pyramid(
+    data: pd.DataFrame,
+    timestamp_label: str,
+    timestamp_format: str,
+    window_sizes: Iterable[str],
+    event_column: Optional[str] = None,
+) -> dict[str, pd.DataFrame]:
+    """
+    Counts events in fixed-size time windows (see `fixed_time_window`) of several sizes at
+    once - timestamps are floored (as epoch-ns integers) once, to the finest size, and the
+    counts rolled up into the coarser ones, which must be multiples of it.
+
+    Args:
+        data (pd.DataFrame): Input DataFrame containing a timestamp and an event column.
+        timestamp_label (str): Name of the timestamp column.
+        timestamp_format (str): Format of the timestamp (if not already datetime or epoch-ns integer).
+        window_sizes (Iterable[str]): Pandas time frequency strings (e.g., '1Min', '5Min', '1h').
+        event_column (Optional[str]): Column identifying events - see `get_event_column`.
+
+    Returns:
+        dict[str, pd.DataFrame]: Counted windows (see `sliding_time_window`), by window size.
+    """
+    event_column = get_event_column(data, event_column)
+    sizes = _pyramid_sizes(window_sizes)
+    finest = next(iter(sizes.values()))
+
+    timestamps = _to_datetime(data, timestamp_label, timestamp_format)
+    valid = (timestamps.notna() & data[event_column].notna()).to_numpy()
+    windows = pd.DatetimeIndex(timestamps[valid]).as_unit("ns").asi8 // finest * finest
+    counts = (
+        data.loc[valid, event_column]
+        .groupby([windows, data.loc[valid, event_column].to_numpy()])
+        .size()
+        .rename_axis(["Window", event_column])
+    )
+
+    return _roll_up(counts, sizes, timestamps.dt.tz)
+
+
+def window_pyramid(
+    counted_windows: pd.DataFrame, window_sizes: Iterable[str]
+) -> dict[str, pd.DataFrame]:
+    """
+    Rolls counted windows (e.g. of `chunked_fixed_time_window`, of the finest of `window_sizes`
+    or finer) up into all of `window_sizes` - see `fixed_time_window_pyramid`.
+    """
+    sizes = _pyramid_sizes(window_sizes)
+    event_column = counted_windows.columns[1]
+    windows = pd.DatetimeIndex(counted_windows["Window"])
+
+    counts = (
+        counted_windows["Count"]
+        .groupby([windows.as_unit("ns").asi8, counted_windows[event_column].to_numpy()])
+        .sum()
+        .rename_axis(["Window", event_column])
+    )
+
+    return _roll_up(counts, sizes, windows.tz)
+
+
+def sliding_time_window(
+    data: pd.DataFrame,
+    timestamp_label: str,
+    timestamp_format: str,
+    window_size: str,
+    step: str,
+    event_column: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Counts events in sliding time windows - `[start, start + window_size)`, for every `start`
+    that's a multiple of `step` (since epoch, as `fixed_time_window` floors), with events.
+
+    Events are sorted by time once, and swept by two pointers - the ones entering a window are
+    counted in, the ones leaving it counted out - so every event is counted twice, whatever the
+    overlap of windows, and only the (window, event) counts are kept - never a copy of the logs
+    per window.
+
+    Args:
+        data (pd.DataFrame): Input DataFrame containing a timestamp and an event column.
+        timestamp_label (str): Name of the timestamp column.
+        timestamp_format (str): Format of the timestamp (if not already datetime or epoch-ns integer).
+        window_size (str): Pandas time frequency string (e.g., '1Min', '30S', '5Min').
+        step (str): Pandas time frequency string - the distance of windows' starts.
+        event_column (Optional[str]): Column identifying events - see `get_event_column`.
+
+    Returns:
+        pd.DataFrame: Counted windows - 'Window' (start), event and 'Count' rows, for
+            `event_count_matrix`.
+    """
+    event_column = get_event_column(data, event_column)
+    size = pd.Timedelta(window_size).value
+    step_size = pd.Timedelta(step).value
+    if size <= 0 or step_size <= 0:
+        raise ValueError("Window size and step must be positive.")
+
+    timestamps = _to_datetime(data, timestamp_label, timestamp_format)
+    valid = (timestamps.notna() & data[event_column].notna()).to_numpy()
+    codes_array, events = pd.factorize(data[event_column][valid])
+    times_array = pd.DatetimeIndex(timestamps[valid]).as_unit("ns").asi8
+    order = np.argsort(times_array, kind="stable")
+    times = times_array[order].tolist()
+    codes = codes_array[order].tolist()
+
+    def first_start(time: int) -> int:
+        # Of the windows containing `time`.
+        return (time - size) // step_size * step_size + step_size
+
+    windows: list[int] = []
+    window_codes: list[int] = []
+    window_counts: list[int] = []
+    counts: dict[int, int] = {}
+    left = right = 0
+    start = first_start(times[0]) if times else 0
+
+    while left < len(times):
+        end = start + size
+        while right < len(times) and times[right] < end:
+            counts[codes[right]] = counts.get(codes[right], 0) + 1
+            right += 1
+        while left < right and times[left] < start:
+            count = counts[codes[left]] - 1
+            if count:
+                counts[codes[left]] = count
+            else:
+                del counts[codes[left]]
+            left += 1
+
+        if left == right:
+            if left == len(times):
+                break
+            # No events - on to the first window of the next one.
+            start = first_start(times[left])
+            continue
+
+        windows.extend([start] * len(counts))
+        window_codes.extend(counts.keys())
+        window_counts.extend(counts.values())
+        start += step_size
+
+    return _counted_windows(
+        _window_starts(windows, timestamps.dt.tz),
+        window_codes,
+        window_counts,
+        events,
+        event_column,
+    )
+
+
+def session_ids(data: pd.DataFrame, column: str, pattern: str = HDFS_BLOCK_ID):
+    """Session ids (lists - a log can belong to several sessions) found in a text column."""
+    return data[column].astype(str).str.findall(pattern)
+
+
+def session_window(
+    data: pd.DataFrame,
+    id_field: str,
+    gap: Optional[str] = None,
+    timestamp_label: Optional[str] = None,
+    timestamp_format: Optional[str] = None,
+    event_column: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Counts events in session (ID-based) windows - events with the same `id_field` (e.g. the HDFS
+    block ids of `session_ids`), in one pass over them (in time order, if `timestamp_label` is
+    given, otherwise in order of the logs).
+
+    With a `gap`, a session ends once its id is inactive for longer than it - sessions are kept
+    in the order of their last events, and the inactive ones are closed from the front, so only
+    active sessions are kept.
+
+    Args:
+        data (pd.DataFrame): Input DataFrame containing a session id and an event column.
+        id_field (str): Name of the session id column - ids, or lists of them.
+        gap (Optional[str]): Pandas time frequency string - the inactivity ending a session.
+        timestamp_label (Optional[str]): Name of the timestamp column (required with `gap`).
+        timestamp_format (Optional[str]): Format of the timestamp (if not already datetime or
+            epoch-ns integer).
+        event_column (Optional[str]): Column identifying events - see `get_event_column`.
+
+    Returns:
+        pd.DataFrame: Counted windows - 'Window' (the session id, and with a `gap`, `@` and the
+            session's start), event and 'Count' rows, for `event_count_matrix`.
+    """
+    event_column = get_event_column(data, event_column)
+    if gap is not None and timestamp_label is None:
+        raise ValueError("Sessions with a gap need a timestamp column.")
+    gap_size = pd.Timedelta(gap).value if gap is not None else None
+
+    columns = [id_field, event_column]
+    if timestamp_label is not None:
+        columns.append(timestamp_label)
+    data = data[columns].explode(id_field)
+    data = data[data[id_field].notna() & data[event_column].notna()]
+
+    if timestamp_label is not None:
+        timestamps = _to_datetime(data, timestamp_label, timestamp_format)
+        data = data[timestamps.notna()]
+        times_array = (
+            pd.DatetimeIndex(timestamps[timestamps.notna()]).as_unit("ns").asi8
+        )
+        order = np.argsort(times_array, kind="stable")
+        times = times_array[order].tolist()
+        data = data.iloc[order]
+    else:
+        times = [0] * len(data)
+
+    codes_array, events = pd.factorize(data[event_column])
+    codes = codes_array.tolist()
+
+    windows: list = []
+    window_codes: list[int] = []
+    window_counts: list[int] = []
+
+    def close(session_id, start: int, counts: dict[int, int]):
+        window = (
+            session_id
+            if gap_size is None
+            else f"{session_id}@{pd.Timestamp(start, tz=timestamps.dt.tz).isoformat()}"
+        )
+        windows.extend([window] * len(counts))
+        window_codes.extend(counts.keys())
+        window_counts.extend(counts.values())
+
+    # Session id -> start, last event time and event counts, by the last event time.
+    sessions: OrderedDict = OrderedDict()
+    for time, session_id, code in zip(times, data[id_field].tolist(), codes):
+        if gap_size is not None:
+            while sessions:
+                oldest_id, (start, last, counts) = next(iter(sessions.items()))
+                if time - last <= gap_size:
+                    break
+                close(oldest_id, start, counts)
+                sessions.popitem(last=False)
+
+        session = sessions.get(session_id)
+        if session is None:
+            session = sessions[session_id] = [time, time, {}]
+        else:
+            session[1] = time
+            sessions.move_to_end(session_id)
+        session[2][code] = session[2].get(code, 0) + 1
+
+    for session_id, (start, _, counts) in sessions.items():
+        close(session_id, start, counts)
+
+    return _counted_windows(windows, window_codes, window_counts, events, event_column)
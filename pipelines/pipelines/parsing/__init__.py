@@ -1,9 +1,12 @@
-from . import preprocessing
+from . import benchmark, preprocessing, synthetic, timestamps
 from .drain import drain
 from .drain3 import drain3
 
 __all__ = [
+    "benchmark",
     "preprocessing",
+    "synthetic",
+    "timestamps",
     "drain",
     "drain3",
 ]
@@ -0,0 +1,241 @@
+"""
+Throughput benchmark of the parsing stages on synthetic corpora (see `synthetic`):
+    - preprocessing (`Preprocessor`) - datasets of `DATASET_PREPROCESSING_PARAMETERS`;
+    - Drain - streaming engine and `logparser` (reference) - datasets of `CONFIGS_2K`;
+    - Drain3 - of the preprocessing output.
+
+Every stage runs in a fresh process, so its peak RSS isn't inflated by the previous ones.
+Results are appended to a version-controlled CSV - regressions show up in its history.
+"""
+
+import argparse
+import logging
+import os
+import resource
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import asdict, replace
+from datetime import datetime
+from importlib import metadata
+from os.path import basename, dirname, exists, join
+from typing import Any, Optional
+
+import pandas as pd
+
+from ..utils.functions import log_generator
+from ..utils.metrics_monitor import MetricsMonitor
+from ..utils.writers import open_batch_writer, output_path
+from .drain3.content_cache import ContentCache
+from .drain3.drain3 import create_template_miner, load_config, mine_templates
+from .drain.configs.configs_2k import CONFIGS_2K
+from .drain.drain import PARSERS
+from .preprocessing import (
+    DATASET_PREPROCESSING_PARAMETERS,
+    Preprocessor,
+    write_preprocessed,
+)
+from .synthetic import synthetic_file, write_corpus
+
+RESULTS_DIR = join("results", "parsing", "benchmark")
+BENCHMARK_FILE = join("benchmarks", "throughput.csv")
+STAGES = ("synthesis", "preprocessing", "drain", "logparser", "drain3")
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="%(message)s")
+
+
+def get_parser(parent_subparsers: Optional[argparse._SubParsersAction] = None):
+    """Parsing throughput benchmark on synthetic corpora."""
+    parser = (
+        argparse.ArgumentParser(description=get_parser.__doc__)
+        if not parent_subparsers
+        else parent_subparsers.add_parser("benchmark", description=get_parser.__doc__)
+    )
+
+    dataset_choices = list(CONFIGS_2K.keys())
+    dataset_choices.append("all")
+    parser.add_argument(
+        "--dataset",
+        choices=dataset_choices,
+        default="all",
+        help="Select the dataset to benchmark - corpora are synthesized from its 2k sample file.",
+    )
+
+    parser.add_argument(
+        "--lines",
+        type=int,
+        default=1000000,
+        help="Number of synthetic log lines per dataset.",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the corpus synthesis - corpora are reused between runs with the same seed.",
+    )
+
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        choices=STAGES[1:],
+        default=list(STAGES[1:]),
+        help="Stages to benchmark - `drain3` requires `preprocessing`.",
+    )
+
+    parser.add_argument(
+        "--output",
+        default=BENCHMARK_FILE,
+        help="CSV file the results are appended to.",
+    )
+
+    parser.set_defaults(func=main)
+
+    return parser
+
+
+def _preprocess(dataset: str, corpus_file: str) -> int:
+    _, log_pattern, timestamp_format = DATASET_PREPROCESSING_PARAMETERS[dataset]
+    preprocessor = Preprocessor(log_pattern, timestamp_format)
+    result_file = output_path(join(RESULTS_DIR, "preprocessing", dataset), "csv")
+    with open_batch_writer(result_file, preprocessor.fieldnames) as writer:
+        log_count, _ = write_preprocessed(
+            preprocessor, log_generator(corpus_file), writer
+        )
+    return log_count
+
+
+def _drain(dataset: str, corpus_file: str, engine: str = "streaming") -> int:
+    config, _ = CONFIGS_2K[dataset]
+    config = replace(
+        config, indir=dirname(corpus_file), outdir=join(RESULTS_DIR, "drain", engine)
+    )
+    parser = PARSERS[engine](**asdict(config))
+    # `logparser` prints progress every 1000 lines.
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        parser.parse(logName=basename(corpus_file))
+    return parser.log_count if engine == "streaming" else len(parser.df_log)
+
+
+def _logparser(dataset: str, corpus_file: str) -> int:
+    return _drain(dataset, corpus_file, "logparser")
+
+
+def _drain3(dataset: str, corpus_file: str) -> int:
+    input_file = output_path(join(RESULTS_DIR, "preprocessing", dataset), "csv")
+    result_file = output_path(join(RESULTS_DIR, "drain3", dataset), "csv")
+    return mine_templates(
+        create_template_miner(load_config()),
+        input_file,
+        result_file,
+        content_cache=ContentCache(),
+    )
+
+
+def _synthesize(dataset: str, line_count: int, seed: int) -> int:
+    write_corpus(dataset, line_count, seed)
+    return line_count
+
+
+STAGE_FUNCTIONS = {
+    "synthesis": _synthesize,
+    "preprocessing": _preprocess,
+    "drain": _drain,
+    "logparser": _logparser,
+    "drain3": _drain3,
+}
+
+
+def _run_stage(stage: str, *stage_args: Any) -> dict[str, Any]:
+    # Runs in a fresh worker process - `ru_maxrss` is the peak RSS of this stage alone.
+    metrics_monitor = MetricsMonitor()
+    metrics_monitor.start()
+    log_count = STAGE_FUNCTIONS[stage](*stage_args)
+    metrics = metrics_monitor.stop(log_count).to_dict("records")[0]
+
+    metrics["Peak RSS (MB)"] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 4
+    )
+    return metrics
+
+
+def run_isolated(stage: str, *stage_args: Any) -> dict[str, Any]:
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        return executor.submit(_run_stage, stage, *stage_args).result()
+
+
+def version_info() -> dict[str, str]:
+    try:
+        version = metadata.version("pipelines")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+
+    return {
+        "Version": version,
+        "Commit": commit,
+        "Python": sys.version.split()[0],
+    }
+
+
+def main(args: Optional[argparse.Namespace] = None):
+    for stage in ("preprocessing", "drain", "drain3"):
+        os.makedirs(join(RESULTS_DIR, stage), exist_ok=True)
+
+    if not args:
+        args = get_parser().parse_args()
+
+    if "drain3" in args.stages and "preprocessing" not in args.stages:
+        raise ValueError("`drain3` stage requires the `preprocessing` stage.")
+
+    datasets = list(CONFIGS_2K.keys()) if args.dataset == "all" else [args.dataset]
+    run = {"Date": datetime.now().isoformat(), **version_info(), "Lines": args.lines}
+    results = []
+
+    for dataset in datasets:
+        stages = ["synthesis"]
+        for stage in args.stages:
+            # Preprocessing (and hence Drain3) only covers the datasets it has parameters for.
+            if (
+                stage in ("drain", "logparser")
+                or dataset in DATASET_PREPROCESSING_PARAMETERS
+            ):
+                stages.append(stage)
+
+        # Synthesized once per line count and seed - later runs only time a cache hit.
+        corpus_file = synthetic_file(dataset, args.lines, args.seed)
+        for stage in stages:
+            metrics = (
+                run_isolated(stage, dataset, args.lines, args.seed)
+                if stage == "synthesis"
+                else run_isolated(stage, dataset, corpus_file)
+            )
+
+            logger.info(f"Dataset `{dataset}` - `{stage}` stage: {metrics}")
+            results.append({**run, "Dataset": dataset, "Stage": stage, **metrics})
+
+    if not results:
+        return
+
+    os.makedirs(dirname(args.output) or os.curdir, exist_ok=True)
+    results_df = pd.DataFrame(results)
+    if exists(args.output):
+        results_df = pd.concat(
+            [pd.read_csv(args.output), results_df], ignore_index=True
+        )
+    results_df.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
-from . import configs, drain, util
+from . import configs, drain, evaluator, streaming, sweep, util
 
 __all__ = [
     "configs",
     "drain",
+    "evaluator",
+    "streaming",
+    "sweep",
     "util",
 ]
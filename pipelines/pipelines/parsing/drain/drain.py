@@ -1,55 +1,205 @@
 """
 Drain Log parser:
     - CLI argument parsing;
-    - DRAIN log parsing;
+    - DRAIN log parsing - `logparser` or the (opt-in) streaming in-repo engine (see `streaming`);
     - DRAIN loghub2k datasets benchmarks;
-    - DRAIN proprietary datasets parsing.
+    - DRAIN proprietary datasets parsing;
+    - skipping up-to-date results, removing stale ones (see `artifacts`).
 """
 
 import argparse
 import logging
 import os
-from dataclasses import asdict
-from time import perf_counter_ns
-from typing import Optional
+import resource
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, replace
+from tempfile import TemporaryDirectory
+from time import perf_counter, process_time
+from typing import Any, Optional
 
 import pandas as pd
 from logparser import Drain
-from logparser.utils import evaluator
 
+from ...utils.artifacts import ArtifactManifest
+from ...utils.compression import find_log_file, open_log, strip_compression_extension
+from . import evaluator
 from .configs.common import RESULTS_DIR, DrainConfig
 from .configs.configs_2k import CONFIGS_2K, OUTDIR_2K
 from .configs.configs_elfak import CONFIGS_ELFAK, OUTDIR_ELFAK
+from .streaming import StreamingLogParser
 from .util import rename_files
 
 __logger = logging.getLogger(__name__)
 
 
-def drain_parse(configs: dict[str, tuple[DrainConfig, str]]):
-    for config_name, (config, log_file) in configs.items():
-        start = perf_counter_ns()
-        parser = Drain.LogParser(**asdict(config))
+class LogParser(Drain.LogParser):
+    """
+    Drain log parser which also reads compressed logs - decompressed on the fly (see `compression`).
+
+    A missing log is looked up among its compressed variants (`X.log` -> `X.log.gz`, ...).
+    Results are named after the decompressed log (`X.log_structured.csv`).
+    """
+
+    def log_to_dataframe(self, log_file, regex, headers, logformat):
+        log_messages = []
+        with open_log(find_log_file(log_file)) as fin:
+            for line in fin:
+                match = regex.search(line.strip())
+                if match is None:
+                    print("[Warning] Skip line: " + line)
+                    continue
+                log_messages.append([match.group(header) for header in headers])
+
+        logdf = pd.DataFrame(log_messages, columns=headers)
+        logdf.insert(0, "LineId", range(1, len(logdf) + 1))
+        print("Total lines: ", len(logdf))
+        return logdf
+
+    def outputResult(self, logClustL):
+        self.logName = strip_compression_extension(self.logName)
+        super().outputResult(logClustL)
+
+
+PARSERS = {
+    "streaming": StreamingLogParser,
+    "logparser": LogParser,
+}
+
+
+def _parse_config(
+    config_name: str, config: DrainConfig, log_file: str, engine: str = "logparser"
+) -> dict[str, Any]:
+    # Runs in a fresh worker process - `ru_maxrss` is the peak memory of this configuration alone.
+    os.makedirs(config.outdir, exist_ok=True)
+    start = perf_counter()
+    cpu_start = process_time()
+
+    # Results are written to a private directory and moved into `outdir` once complete, so
+    # concurrent configurations never see (or clobber) each other's partial results.
+    with TemporaryDirectory(
+        dir=config.outdir, prefix=f".{config_name}-"
+    ) as staging_dir:
+        parser = PARSERS[engine](**asdict(replace(config, outdir=staging_dir)))
         parser.parse(logName=log_file)
-        end = perf_counter_ns()
-        __logger.info(f"Finished parsing: `{config_name}` [{end - start/1000}us]")
+        for result_file in os.listdir(staging_dir):
+            os.replace(
+                os.path.join(staging_dir, result_file),
+                os.path.join(config.outdir, result_file),
+            )
 
+    return {
+        "Wall Time [s]": round(perf_counter() - start, 4),
+        "CPU Time [s]": round(process_time() - cpu_start, 4),
+        "Peak Memory (MB)": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 4
+        ),
+    }
 
-def drain_benchmark(configs: dict[str, tuple[DrainConfig, str]]):
+
+def drain_parse(
+    configs: dict[str, tuple[DrainConfig, str]],
+    jobs: int = 1,
+    engine: str = "logparser",
+) -> dict[str, dict[str, Any]]:
+    """Parses every configuration in its own worker process, returns their timings by name."""
+    timings = {}
+
+    # One configuration per worker process - peak memory isn't inherited from previous ones.
+    with ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1) as executor:
+        futures = {
+            config_name: executor.submit(
+                _parse_config, config_name, config, log_file, engine
+            )
+            for config_name, (config, log_file) in configs.items()
+        }
+        for config_name, future in futures.items():
+            timings[config_name] = future.result()
+            __logger.info(
+                f"Finished parsing: `{config_name}` "
+                f"[{timings[config_name]['Wall Time [s]']}s]"
+            )
+
+    return timings
+
+
+def result_files(config: DrainConfig, log_file: str) -> list[str]:
+    """Structured logs and templates of a parsed log - as named by `rename_files`."""
+    name = strip_compression_extension(log_file)
+    name = name[: -len(".log")] if name.endswith(".log") else name
+    return [
+        os.path.join(config.outdir, f"{name}_structured.csv"),
+        os.path.join(config.outdir, f"{name}_templates.csv"),
+    ]
+
+
+def _artifact(
+    config: DrainConfig, log_file: str, engine: str
+) -> tuple[list[str], dict[str, Any]]:
+    """Input files and parameters of a configuration's results."""
+    return [find_log_file(os.path.join(config.indir, log_file))], {
+        "config": asdict(config),
+        "engine": engine,
+    }
+
+
+def stale_configs(
+    configs: dict[str, tuple[DrainConfig, str]], engine: str = "logparser"
+) -> dict[str, tuple[DrainConfig, str]]:
+    """Configurations whose results aren't up to date - the others are skipped."""
+    stale = {}
+    for config_name, (config, log_file) in configs.items():
+        input_files, parameters = _artifact(config, log_file, engine)
+        if ArtifactManifest(config.outdir).is_up_to_date(
+            config_name, input_files, parameters
+        ):
+            __logger.info(f"Results of `{config_name}` are up to date.")
+            continue
+        stale[config_name] = (config, log_file)
+    return stale
+
+
+def record_configs(
+    configs: dict[str, tuple[DrainConfig, str]], engine: str = "logparser"
+):
+    for config_name, (config, log_file) in configs.items():
+        input_files, parameters = _artifact(config, log_file, engine)
+        ArtifactManifest(config.outdir).record(
+            config_name, input_files, parameters, result_files(config, log_file)
+        )
+
+
+def prune_configs(configs: dict[str, tuple[DrainConfig, str]]):
+    """Removes results of configurations no longer among `configs`, or whose logs are gone."""
+    outdirs = {config.outdir for config, _ in configs.values()}
+    for outdir in outdirs:
+        for config_name in ArtifactManifest(outdir).prune(configs.keys()):
+            __logger.info(f"Stale results of `{config_name}` removed.")
+
+
+def drain_benchmark(
+    configs: dict[str, tuple[DrainConfig, str]],
+    timings: Optional[dict[str, dict[str, Any]]] = None,
+):
     benchmarks = []
     outdir = ""
 
     for config_name, (config, log_file) in configs.items():
         f1_measure, accuracy = evaluator.evaluate(
             groundtruth=os.path.join(config.indir, log_file + "_structured.csv"),
-            parsedresult=os.path.join(config.outdir, log_file + "_structured.csv"),
+            parsedresult=result_files(config, log_file)[0],
+        )
+        benchmarks.append(
+            {
+                "Dataset Name": config_name,
+                "F1 Measure": f1_measure,
+                "Accuracy": accuracy,
+                **(timings or {}).get(config_name, {}),
+            }
         )
-        benchmarks.append((config_name, f1_measure, accuracy))
         outdir = config.outdir
 
     if benchmarks and outdir:
-        df_benchmark = pd.DataFrame(
-            benchmarks, columns=["Dataset Name", "F1 Measure", "Accuracy"]
-        )
+        df_benchmark = pd.DataFrame(benchmarks)
         df_benchmark.set_index("Dataset Name", inplace=True)
         df_benchmark.to_csv(os.path.join(outdir, f"benchmark.csv"), float_format="%.6f")
         print(df_benchmark)
@@ -70,6 +220,24 @@ def get_parser(parent_subparsers: Optional[argparse._SubParsersAction] = None):
     parser.add_argument(
         "--elfak", action="store_true", help="Parse Elfak datasets and store results."
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes - configurations are parsed concurrently.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=PARSERS.keys(),
+        default="logparser",
+        help="Drain implementation - `logparser` is the reference one, `streaming` doesn't load "
+        "whole logs into memory.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Parse all configurations - even the ones with up-to-date results.",
+    )
     parser.set_defaults(func=main)
     return parser
 
@@ -87,14 +255,25 @@ def main(args: Optional[argparse.Namespace] = None):
 
     # Benchmarking LogHub2k datasets.
     if args.loghub2k:
-        drain_parse(CONFIGS_2K)
-        drain_benchmark(CONFIGS_2K)
+        configs = CONFIGS_2K if args.force else stale_configs(CONFIGS_2K, args.engine)
+        timings = drain_parse(configs, args.jobs, args.engine)
+        # Only once all the workers are done - their results are complete and in place.
+        rename_files(RESULTS_DIR)
+        record_configs(configs, args.engine)
+        prune_configs(CONFIGS_2K)
+        # Up-to-date results are benchmarked too (without timings), unless all are.
+        if configs:
+            drain_benchmark(CONFIGS_2K, timings)
 
     # Parsing proprietary datasets.
     if args.elfak:
-        drain_parse(CONFIGS_ELFAK)
-
-    rename_files(RESULTS_DIR)
+        configs = (
+            CONFIGS_ELFAK if args.force else stale_configs(CONFIGS_ELFAK, args.engine)
+        )
+        drain_parse(configs, args.jobs, args.engine)
+        rename_files(RESULTS_DIR)
+        record_configs(configs, args.engine)
+        prune_configs(CONFIGS_ELFAK)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,87 @@
+"""
+Grouping accuracy and F1 of log parsing - same results as `logparser.utils.evaluator`, computed
+with NumPy over integer-encoded event ids (instead of a pandas selection per parsed event),
+so it scales to full-size (multi-million log) datasets.
+"""
+
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+
+def _pair_count(counts: np.ndarray) -> Union[int, np.float64]:
+    """
+    Number of pairs of logs within the same group - sum of `counts choose 2`.
+
+    Typed like `logparser`'s sum of `comb`s - `0` (dividing by it raises) or a NumPy float.
+    """
+    counts = counts.astype(np.int64)
+    pair_count = int((counts * (counts - 1) // 2).sum())
+    return np.float64(pair_count) if pair_count else 0
+
+
+def evaluate(groundtruth: str, parsedresult: str) -> tuple[float, float]:
+    """
+    Evaluation of log parsing accuracy - `groundtruth` and `parsedresult` are structured CSV files
+    (with `EventId` columns) of the same logs. Returns the F1 measure and the grouping accuracy.
+    """
+    df_groundtruth = pd.read_csv(groundtruth, usecols=["EventId"])
+    df_parsedlog = pd.read_csv(parsedresult, usecols=["EventId"])
+    # Remove invalid groundtruth event Ids
+    non_empty_log_ids = df_groundtruth[~df_groundtruth["EventId"].isnull()].index
+    df_groundtruth = df_groundtruth.loc[non_empty_log_ids]
+    df_parsedlog = df_parsedlog.loc[non_empty_log_ids]
+    precision, recall, f_measure, accuracy = get_accuracy(
+        df_groundtruth["EventId"], df_parsedlog["EventId"]
+    )
+    print(
+        "Precision: {:.4f}, Recall: {:.4f}, F1_measure: {:.4f}, Parsing_Accuracy: {:.4f}".format(
+            precision, recall, f_measure, accuracy
+        )
+    )
+    return f_measure, accuracy
+
+
+def get_accuracy(
+    series_groundtruth: pd.Series, series_parsedlog: pd.Series
+) -> tuple[float, float, float, float]:
+    """
+    Precision, recall, F1 measure and grouping accuracy of parsed event ids of logs against their
+    ground truth event ids (aligned series). Missing event ids don't form a group.
+    """
+    groundtruth, _ = pd.factorize(series_groundtruth)
+    parsed, _ = pd.factorize(series_parsedlog)
+    size = len(groundtruth)
+
+    groundtruth_counts = np.bincount(groundtruth[groundtruth >= 0])
+    real_pairs = _pair_count(groundtruth_counts)
+
+    parsed_mask = parsed >= 0
+    parsed_counts = np.bincount(parsed[parsed_mask])
+    parsed_pairs = _pair_count(parsed_counts)
+
+    # Groups of logs with the same (parsed, ground truth) event ids.
+    both_mask = parsed_mask & (groundtruth >= 0)
+    pairs, pair_counts = np.unique(
+        parsed[both_mask].astype(np.int64) * max(len(groundtruth_counts), 1)
+        + groundtruth[both_mask],
+        return_counts=True,
+    )
+    accurate_pairs = _pair_count(pair_counts)
+
+    # A parsed event is accurate if it's exactly one ground truth event - all its logs, only them.
+    pair_parsed = pairs // max(len(groundtruth_counts), 1)
+    pair_groundtruth = pairs % max(len(groundtruth_counts), 1)
+    groundtruth_events = np.bincount(pair_parsed, minlength=len(parsed_counts))
+    single = groundtruth_events[pair_parsed] == 1
+    accurate = single & (
+        parsed_counts[pair_parsed] == groundtruth_counts[pair_groundtruth]
+    )
+    accurate_events = int(parsed_counts[pair_parsed[accurate]].sum())
+
+    precision = float(accurate_pairs) / parsed_pairs
+    recall = float(accurate_pairs) / real_pairs
+    f_measure = 2 * precision * recall / (precision + recall)
+    accuracy = float(accurate_events) / size
+    return precision, recall, f_measure, accuracy
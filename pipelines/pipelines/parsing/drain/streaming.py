@@ -0,0 +1,326 @@
+"""
+Streaming Drain log parser - a drop-in replacement of `logparser.Drain.LogParser`, with the same
+templates and results (`<log>_structured.csv`, `<log>_templates.csv`), that doesn't load the log:
+    - the first pass streams the log through the prefix tree - each structured row is written to
+      a temporary file, along with the index of its cluster;
+    - the second pass streams the temporary file into the structured results - with the final
+      templates of the clusters (they're generalized as the log is parsed).
+
+Memory is bound by the prefix tree - `__slots__` nodes and clusters, interned tokens - not by
+the size of the log.
+"""
+
+import csv
+import hashlib
+import os
+from sys import intern
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Optional
+
+import regex as re
+
+from ...utils.compression import find_log_file, open_log, strip_compression_extension
+
+WILDCARD = "<*>"
+
+
+class Node:
+    __slots__ = ("children", "clusters")
+
+    def __init__(self):
+        self.children: dict[str, "Node"] = {}
+        # Only leaves (nodes at the maximal depth) have clusters.
+        self.clusters: list["Cluster"] = []
+
+
+class Cluster:
+    __slots__ = ("template", "index")
+
+    def __init__(self, template: list[str], index: int):
+        self.template = template
+        self.index = index
+
+
+def has_numbers(token: str) -> bool:
+    return any(char.isdigit() for char in token)
+
+
+def log_format_regex(log_format: str) -> tuple[list[str], re.Pattern]:
+    """Headers and the regex of a log format (e.g. `<Date> <Time> <Level>: <Content>`)."""
+    headers = []
+    regex = ""
+    for i, splitter in enumerate(re.split(r"(<[^<>]+>)", log_format)):
+        if i % 2 == 0:
+            regex += re.sub(" +", r"\\s+", splitter)
+        else:
+            header = splitter.strip("<").strip(">")
+            regex += f"(?P<{header}>.*?)"
+            headers.append(header)
+    return headers, re.compile(f"^{regex}$")
+
+
+def template_id(template: str) -> str:
+    return hashlib.md5(template.encode("utf-8")).hexdigest()[0:8]
+
+
+def parameter_regex(template: str) -> Optional[re.Pattern]:
+    """Regex extracting the parameters of a template from the content, `None` if it has none."""
+    template_regex = re.sub(r"<.{1,5}>", WILDCARD, template)
+    if WILDCARD not in template_regex:
+        return None
+    template_regex = re.sub(r"([^A-Za-z0-9])", r"\\\1", template_regex)
+    template_regex = re.sub(r"\\ +", r"\\s+", template_regex)
+    return re.compile("^" + template_regex.replace(r"\<\*\>", "(.*?)") + "$")
+
+
+def parameter_list(regex: Optional[re.Pattern], content: str) -> list[str]:
+    if regex is None:
+        return []
+    parameters = regex.findall(content)
+    parameters = parameters[0] if parameters else ()
+    return list(parameters) if isinstance(parameters, tuple) else [parameters]
+
+
+class StreamingLogParser:
+    """Drain, configured (and called) like `logparser.Drain.LogParser` - see `DrainConfig`."""
+
+    def __init__(
+        self,
+        log_format: str,
+        indir: str = "./",
+        outdir: str = "./result/",
+        depth: int = 4,
+        st: float = 0.4,
+        maxChild: int = 100,
+        rex: Optional[list[str]] = None,
+        keep_para: bool = True,
+    ):
+        self.path = indir
+        self.savePath = outdir
+        # Root and the sequence length layer aren't counted.
+        self.depth = depth - 2
+        # Tokens leading to a leaf - clusters of shorter logs never make it to a leaf.
+        self._prefix_length = max(self.depth - 1, 0)
+        self.st = st
+        self.maxChild = maxChild
+        self.rex = [re.compile(pattern) for pattern in rex or []]
+        self.keep_para = keep_para
+        self.headers, self.regex = log_format_regex(log_format)
+
+        self.log_count = 0
+        self._root: dict[int, Node] = {}
+        self._clusters: list[Cluster] = []
+        # Logs shorter than the tree is deep are never added to a leaf, so they never match
+        # (nor generalize) a cluster - logs with the same tokens share a cluster nonetheless.
+        self._short_clusters: dict[tuple[str, ...], Cluster] = {}
+
+    @property
+    def cluster_count(self) -> int:
+        return len(set(self.templates))
+
+    @property
+    def templates(self) -> list[str]:
+        """Current templates of the clusters, by cluster index."""
+        return [" ".join(cluster.template) for cluster in self._clusters]
+
+    def _new_cluster(self, tokens: list[str]) -> Cluster:
+        cluster = Cluster(tokens, len(self._clusters))
+        self._clusters.append(cluster)
+        return cluster
+
+    def _tree_search(self, tokens: list[str]) -> Optional[Cluster]:
+        node = self._root.get(len(tokens))
+        if node is None:
+            return None
+
+        for token in tokens[: self._prefix_length]:
+            child = node.children.get(token)
+            if child is None:
+                child = node.children.get(WILDCARD)
+                if child is None:
+                    return None
+            node = child
+
+        return self._fast_match(node.clusters, tokens)
+
+    def _add_to_prefix_tree(self, cluster: Cluster):
+        template = cluster.template
+        node = self._root.get(len(template))
+        if node is None:
+            node = self._root[len(template)] = Node()
+
+        for token in template[: self._prefix_length]:
+            children = node.children
+            child = children.get(token)
+            if child is None:
+                if has_numbers(token):
+                    child = children.get(WILDCARD)
+                    if child is None:
+                        child = children[WILDCARD] = Node()
+                elif WILDCARD in children:
+                    if len(children) < self.maxChild:
+                        child = children[token] = Node()
+                    else:
+                        child = children[WILDCARD]
+                elif len(children) + 1 < self.maxChild:
+                    child = children[token] = Node()
+                elif len(children) + 1 == self.maxChild:
+                    child = children[WILDCARD] = Node()
+                else:
+                    child = children[WILDCARD]
+            node = child
+
+        node.clusters.append(cluster)
+
+    def _fast_match(
+        self, clusters: list[Cluster], tokens: list[str]
+    ) -> Optional[Cluster]:
+        max_similarity = -1.0
+        max_parameter_count = -1
+        max_cluster = None
+
+        for cluster in clusters:
+            similar_count = 0
+            parameter_count = 0
+            for template_token, token in zip(cluster.template, tokens):
+                if template_token == WILDCARD:
+                    parameter_count += 1
+                elif template_token == token:
+                    similar_count += 1
+
+            similarity = similar_count / len(tokens)
+            if similarity > max_similarity or (
+                similarity == max_similarity and parameter_count > max_parameter_count
+            ):
+                max_similarity = similarity
+                max_parameter_count = parameter_count
+                max_cluster = cluster
+
+        return max_cluster if max_similarity >= self.st else None
+
+    def preprocess(self, content: str) -> str:
+        for regex in self.rex:
+            content = regex.sub(WILDCARD, content)
+        return content
+
+    def tokenize(self, content: str) -> list[str]:
+        """Masked (see `rex`) tokens of the content of a log."""
+        return list(map(intern, self.preprocess(content).strip().split()))
+
+    def add_log_message(self, content: str) -> Cluster:
+        """Clusters the content of a log, returns its (possibly generalized) cluster."""
+        return self.add_tokens(self.tokenize(content))
+
+    def add_tokens(self, tokens: list[str]) -> Cluster:
+        """Clusters masked tokens of a log (see `tokenize`)."""
+
+        # Same condition under which `logparser` adds a cluster to a leaf.
+        if len(tokens) < max(self.depth, 1):
+            key = tuple(tokens)
+            cluster = self._short_clusters.get(key)
+            if cluster is None:
+                cluster = self._short_clusters[key] = self._new_cluster(tokens)
+            return cluster
+
+        cluster = self._tree_search(tokens)
+        if cluster is None:
+            cluster = self._new_cluster(tokens)
+            self._add_to_prefix_tree(cluster)
+        else:
+            template = [
+                template_token if template_token == token else WILDCARD
+                for template_token, token in zip(cluster.template, tokens)
+            ]
+            if template != cluster.template:
+                cluster.template = template
+
+        return cluster
+
+    def parse(self, logName: str):
+        print("Parsing file: " + os.path.join(self.path, logName))
+        start = perf_counter()
+        log_name = strip_compression_extension(logName)
+        os.makedirs(self.savePath, exist_ok=True)
+
+        with TemporaryDirectory(dir=self.savePath) as temporary_dir:
+            clustered_file = os.path.join(temporary_dir, "clustered.csv")
+            self._cluster_logs(os.path.join(self.path, logName), clustered_file)
+            self._output_result(clustered_file, log_name)
+
+        print(f"Parsing done. [Time taken: {perf_counter() - start:.3f}s]")
+
+    def _cluster_logs(self, log_file: str, clustered_file: str):
+        """First pass - header fields and the cluster index of every log."""
+        content_index = self.headers.index("Content")
+        self.log_count = 0
+
+        with open_log(find_log_file(log_file)) as fin, open(
+            clustered_file, "w", newline="", encoding="utf-8"
+        ) as fout:
+            writer = csv.writer(fout)
+            for line in fin:
+                match = self.regex.search(line.strip())
+                if match is None:
+                    print("[Warning] Skip line: " + line)
+                    continue
+
+                row = [match.group(header) for header in self.headers]
+                row.append(self.add_log_message(row[content_index]).index)
+                writer.writerow(row)
+                self.log_count += 1
+
+        print("Total lines: ", self.log_count)
+
+    def _output_result(self, clustered_file: str, log_name: str):
+        """Second pass - structured logs, with the final templates of their clusters."""
+        templates = self.templates
+        template_ids = [template_id(template) for template in templates]
+        parameter_regexes: dict[str, Optional[re.Pattern]] = {}
+        # In the order of the first occurrence, like `logparser`.
+        occurrences: dict[str, int] = {}
+        content_index = self.headers.index("Content")
+
+        columns = ["LineId", *self.headers, "EventId", "EventTemplate"]
+        if self.keep_para:
+            columns.append("ParameterList")
+
+        with open(clustered_file, newline="", encoding="utf-8") as fin, open(
+            os.path.join(self.savePath, log_name + "_structured.csv"),
+            "w",
+            newline="",
+            encoding="utf-8",
+        ) as fout:
+            # Same dialect as `DataFrame.to_csv`.
+            writer = csv.writer(fout, lineterminator=os.linesep)
+            writer.writerow(columns)
+
+            for line_id, row in enumerate(csv.reader(fin), start=1):
+                cluster_index = int(row.pop())
+                template = templates[cluster_index]
+                occurrences[template] = occurrences.get(template, 0) + 1
+
+                structured: list[Any] = [
+                    line_id,
+                    *row,
+                    template_ids[cluster_index],
+                    template,
+                ]
+                if self.keep_para:
+                    if template not in parameter_regexes:
+                        parameter_regexes[template] = parameter_regex(template)
+                    structured.append(
+                        parameter_list(parameter_regexes[template], row[content_index])
+                    )
+                writer.writerow(structured)
+
+        with open(
+            os.path.join(self.savePath, log_name + "_templates.csv"),
+            "w",
+            newline="",
+            encoding="utf-8",
+        ) as f:
+            writer = csv.writer(f, lineterminator=os.linesep)
+            writer.writerow(["EventId", "EventTemplate", "Occurrences"])
+            for template, occurrence in occurrences.items():
+                writer.writerow([template_id(template), template, occurrence])
@@ -0,0 +1,310 @@
+"""
+Drain parameter sweep on the Loghub2k datasets:
+    - grid of `st`, `depth`, `maxChild` and `rex` sets, or successive halving over it - every rung
+      evaluates the surviving points on `eta` times more logs, keeping the best `1/eta` of them;
+    - grid points are evaluated in parallel, each in a fresh worker process (peak memory);
+    - masked token sequences are cached on disk, per dataset and `rex` set - grid points (and
+      later sweeps) only cluster, they don't repeat the regex preprocessing;
+    - accuracy (`evaluator`) vs throughput Pareto table per dataset.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import pickle
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, replace
+from datetime import datetime
+from os.path import exists, join
+from time import perf_counter
+from typing import Any, Optional
+
+import pandas as pd
+
+from ...utils.compression import find_log_file, open_log
+from . import evaluator
+from .configs.common import COMMON_PATTERNS, RESULTS_DIR, DrainConfig
+from .configs.configs_2k import CONFIGS_2K
+from .streaming import StreamingLogParser, template_id
+
+SWEEP_DIR = join(RESULTS_DIR, "sweep")
+CACHE_DIR = join(SWEEP_DIR, "cache")
+
+ST_GRID = [0.3, 0.4, 0.5, 0.6, 0.7, 0.8]
+DEPTH_GRID = [3, 4, 5, 6]
+MAX_CHILD_GRID = [10, 100]
+# `rex` sets - dataset-specific (from `CONFIGS_2K`), common, both or none.
+REX_SETS = ("dataset", "common", "both", "none")
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="%(message)s")
+
+
+def get_parser(parent_subparsers: Optional[argparse._SubParsersAction] = None):
+    """Drain parameter sweep - accuracy vs throughput Pareto tables."""
+    parser = (
+        argparse.ArgumentParser(description=get_parser.__doc__)
+        if not parent_subparsers
+        else parent_subparsers.add_parser("drain-sweep", description=get_parser.__doc__)
+    )
+
+    parser.add_argument(
+        "--datasets",
+        nargs="+",
+        choices=CONFIGS_2K.keys(),
+        default=list(CONFIGS_2K.keys()),
+        help="Loghub2k datasets to sweep.",
+    )
+    parser.add_argument("--st", nargs="+", type=float, default=ST_GRID)
+    parser.add_argument("--depth", nargs="+", type=int, default=DEPTH_GRID)
+    parser.add_argument("--max-child", nargs="+", type=int, default=MAX_CHILD_GRID)
+    parser.add_argument("--rex", nargs="+", choices=REX_SETS, default=list(REX_SETS))
+    parser.add_argument(
+        "--halving",
+        type=int,
+        default=None,
+        metavar="ETA",
+        help="Successive halving (keeping the best 1/ETA of points per rung) instead of the full grid.",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes - grid points are evaluated concurrently.",
+    )
+
+    parser.set_defaults(func=main)
+
+    return parser
+
+
+def rex_set(config: DrainConfig, name: str) -> list[str]:
+    if name == "dataset":
+        return list(config.rex)
+    if name == "common":
+        return list(COMMON_PATTERNS)
+    if name == "both":
+        return list(config.rex) + [
+            pattern for pattern in COMMON_PATTERNS if pattern not in config.rex
+        ]
+    return []
+
+
+def masked_sequences(config: DrainConfig, log_file: str) -> tuple[str, float]:
+    """
+    Caches masked token sequences of the contents of a log - returns the cache file and the time
+    the masking took (zero if already cached).
+
+    Cache is keyed by the log (path, size, modification time), its format and the `rex` set.
+    """
+    log_path = find_log_file(join(config.indir, log_file))
+    stat = os.stat(log_path)
+    key = json.dumps(
+        [
+            os.path.abspath(log_path),
+            stat.st_size,
+            stat.st_mtime_ns,
+            config.log_format,
+            config.rex,
+        ]
+    )
+    cache_file = join(
+        CACHE_DIR, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.pickle"
+    )
+    if exists(cache_file):
+        return cache_file, 0.0
+
+    start = perf_counter()
+    parser = StreamingLogParser(**asdict(config))
+    sequences = []
+    with open_log(log_path) as f:
+        for line in f:
+            # Same lines as `logparser` (and the ground truth) - unmatched ones are skipped.
+            match = parser.regex.search(line.strip())
+            if match is not None:
+                sequences.append(parser.tokenize(match.group("Content")))
+    masking_time = perf_counter() - start
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    temporary_file = f"{cache_file}.tmp"
+    with open(temporary_file, "wb") as f:
+        pickle.dump(sequences, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_file, cache_file)
+
+    return cache_file, masking_time
+
+
+def _evaluate_point(
+    config: DrainConfig, cache_file: str, groundtruth_file: str, log_limit: int
+) -> dict[str, Any]:
+    # Runs in a fresh worker process - `ru_maxrss` is the peak memory of this grid point alone.
+    with open(cache_file, "rb") as f:
+        sequences = pickle.load(f)[:log_limit]
+
+    parser = StreamingLogParser(**asdict(config))
+    start = perf_counter()
+    clusters = [parser.add_tokens(tokens).index for tokens in sequences]
+    elapsed_time = perf_counter() - start
+
+    event_ids = [template_id(template) for template in parser.templates]
+    parsed = pd.Series([event_ids[cluster] for cluster in clusters])
+
+    # Same as `evaluator.evaluate` - logs without a ground truth event are left out.
+    groundtruth = pd.read_csv(groundtruth_file, usecols=["EventId"])["EventId"]
+    groundtruth = groundtruth.iloc[: len(parsed)]
+    groundtruth = groundtruth[~groundtruth.isnull()]
+    try:
+        _, _, f1_measure, accuracy = evaluator.get_accuracy(
+            groundtruth, parsed.loc[groundtruth.index]
+        )
+    except ZeroDivisionError:  # No pair of logs in the same event.
+        f1_measure, accuracy = math.nan, math.nan
+
+    return {
+        "Logs": len(sequences),
+        "F1 Measure": f1_measure,
+        "Accuracy": accuracy,
+        "Clusters": parser.cluster_count,
+        "Logs/sec": round(len(sequences) / elapsed_time, 4) if elapsed_time else 0,
+        "Peak Memory (MB)": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 4
+        ),
+    }
+
+
+def grid(args: argparse.Namespace) -> list[dict[str, Any]]:
+    return [
+        {"st": st, "depth": depth, "maxChild": max_child, "rex": rex}
+        for st, depth, max_child, rex in itertools.product(
+            args.st, args.depth, args.max_child, args.rex
+        )
+    ]
+
+
+def pareto_front(df: pd.DataFrame) -> pd.Series:
+    """Mask of points no other point beats in both accuracy and throughput."""
+    accuracy = df["Accuracy"].fillna(-1).to_numpy()
+    throughput = df["Logs/sec"].to_numpy()
+    return pd.Series(
+        [
+            not (
+                (accuracy >= accuracy[i])
+                & (throughput >= throughput[i])
+                & ((accuracy > accuracy[i]) | (throughput > throughput[i]))
+            ).any()
+            for i in range(len(df))
+        ],
+        index=df.index,
+    )
+
+
+def _rank_key(result: dict[str, Any]) -> tuple[float, float]:
+    # Accuracy first, throughput breaks ties.
+    accuracy = -1.0 if math.isnan(result["Accuracy"]) else result["Accuracy"]
+    return accuracy, result["Logs/sec"]
+
+
+def sweep_dataset(
+    dataset: str, points: list[dict[str, Any]], jobs: int, eta: Optional[int]
+) -> pd.DataFrame:
+    base_config, log_file = CONFIGS_2K[dataset]
+    groundtruth_file = join(base_config.indir, log_file + "_structured.csv")
+
+    # Masked once per `rex` set - shared by all the grid points.
+    cache_files = {}
+    for rex in {point["rex"] for point in points}:
+        config = replace(base_config, rex=rex_set(base_config, rex))
+        cache_files[rex], masking_time = masked_sequences(config, log_file)
+        logger.info(
+            f"Dataset `{dataset}` - `{rex}` masked sequences "
+            f"{'cached' if not masking_time else f'in {masking_time:.3f}s'}."
+        )
+
+    with open(cache_files[points[0]["rex"]], "rb") as f:
+        log_count = len(pickle.load(f))
+
+    # Full grid is a single rung, over all the logs.
+    rung_count = 1 if not eta else max(int(math.log(len(points), eta)), 0) + 1
+    results = []
+
+    with ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=1) as executor:
+        for rung in range(rung_count):
+            log_limit = (
+                max(math.ceil(log_count / eta ** (rung_count - 1 - rung)), 1)
+                if eta
+                else log_count
+            )
+            futures = [
+                executor.submit(
+                    _evaluate_point,
+                    replace(
+                        base_config,
+                        st=point["st"],
+                        depth=point["depth"],
+                        maxChild=point["maxChild"],
+                        rex=rex_set(base_config, point["rex"]),
+                    ),
+                    cache_files[point["rex"]],
+                    groundtruth_file,
+                    log_limit,
+                )
+                for point in points
+            ]
+            rung_results = [
+                {"Dataset": dataset, "Rung": rung, **point, **future.result()}
+                for point, future in zip(points, futures)
+            ]
+            results.extend(rung_results)
+
+            if rung < rung_count - 1:
+                ranked = sorted(
+                    range(len(points)),
+                    key=lambda i: _rank_key(rung_results[i]),
+                    reverse=True,
+                )
+                points = [points[i] for i in ranked[: math.ceil(len(points) / eta)]]
+
+    df = pd.DataFrame(results)
+    # Pareto front of the last rung - the only one evaluated on all the logs.
+    last_rung = df["Rung"] == rung_count - 1
+    df["Pareto"] = False
+    df.loc[last_rung, "Pareto"] = pareto_front(df[last_rung])
+    return df
+
+
+def main(args: Optional[argparse.Namespace] = None):
+    os.makedirs(SWEEP_DIR, exist_ok=True)
+
+    if not args:
+        args = get_parser().parse_args()
+
+    points = grid(args)
+    sweeps = []
+    for dataset in args.datasets:
+        df = sweep_dataset(dataset, points, args.jobs, args.halving)
+        sweeps.append(df)
+
+        pareto = df[df["Pareto"]].sort_values("Accuracy", ascending=False)
+        logger.info(
+            f"Dataset `{dataset}` Pareto front:\n{pareto.to_string(index=False)}"
+        )
+
+    if not sweeps:
+        return
+
+    df_sweep = pd.concat(sweeps, ignore_index=True)
+    timestamp = datetime.now().isoformat()
+    df_sweep.to_csv(join(SWEEP_DIR, f"sweep_{timestamp}.csv"), index=False)
+    df_sweep[df_sweep["Pareto"]].sort_values(
+        ["Dataset", "Accuracy"], ascending=[True, False]
+    ).to_csv(join(SWEEP_DIR, f"pareto_{timestamp}.csv"), index=False)
+
+
+if __name__ == "__main__":
+    main()
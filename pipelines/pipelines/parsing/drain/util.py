@@ -14,4 +14,5 @@ def rename_files(root_dir: str):
                 old_file = os.path.join(subdir, file)
                 new_file = os.path.join(subdir, new_name)
 
-                os.rename(old_file, new_file)
+                # Replaces results of previous runs (`rename` fails on Windows if they exist).
+                os.replace(old_file, new_file)
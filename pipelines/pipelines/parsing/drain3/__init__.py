@@ -1,5 +1,19 @@
-from . import drain3
+from . import (
+    content_cache,
+    drain3,
+    masking,
+    masking_benchmark,
+    parameter_extractor,
+    sharded,
+    snapshots,
+)
 
 __all__ = [
+    "content_cache",
     "drain3",
+    "masking",
+    "masking_benchmark",
+    "parameter_extractor",
+    "sharded",
+    "snapshots",
 ]
@@ -0,0 +1,107 @@
+"""
+Exact-duplicate fast path of Drain3 template mining - production logs are highly repetitive, and
+a log with the same content as a recent one is mined the same way, as long as the miner hasn't
+changed in between:
+    - bounded LRU cache of `Content` -> (cluster id, template, parameters);
+    - a hit skips masking, the prefix tree search and the parameter extraction - it only updates
+      the size (and the recency) of the cluster, like `Drain.add_log_message` does, and saves the
+      state when a snapshot is due, like `TemplateMiner.add_log_message` does;
+    - every change of the miner (a created cluster, a generalized template) invalidates the whole
+      cache - a new or generalized cluster can be a better match for cached contents, so only
+      clearing it keeps results identical to mining without the cache.
+"""
+
+import time
+from time import perf_counter
+from typing import Optional
+
+from cachetools import LRUCache
+from drain3 import TemplateMiner
+
+from .parameter_extractor import ParameterExtractor
+
+DEFAULT_CACHE_SIZE = 100000
+
+
+class ContentCache:
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        self._cache: LRUCache = LRUCache(maxsize=maxsize)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Time spent mining hits and misses - misses are what every log costs without the cache.
+        self.hit_time = 0.0
+        self.miss_time = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def speedup(self) -> float:
+        """Estimated speedup of mining - all logs at the cost of a miss, to the actual cost."""
+        if not self.misses:
+            return 1.0
+        elapsed_time = self.hit_time + self.miss_time
+        uncached_time = self.miss_time / self.misses * (self.hits + self.misses)
+        return uncached_time / elapsed_time if elapsed_time else 1.0
+
+    def _lookup(
+        self, template_miner: TemplateMiner, content: str
+    ) -> Optional[tuple[int, str, list[str]]]:
+        cached = self._cache.get(content)
+        if cached is None:
+            return None
+
+        cluster_id, template, parameters = cached
+        id_to_cluster = template_miner.drain.id_to_cluster
+        # Clusters can be evicted (`max_clusters`) - only ever by a created cluster, which
+        # invalidates the cache, but a stale entry is never trusted.
+        cluster = id_to_cluster.get(cluster_id)
+        if cluster is None or cluster.get_template() != template:
+            del self._cache[content]
+            return None
+
+        cluster.size += 1
+        # Same recency update as a match in `Drain.add_log_message`.
+        id_to_cluster[cluster_id]
+
+        # Same (periodic) snapshot as `TemplateMiner.add_log_message` - hits don't reach it.
+        if template_miner.persistence_handler is not None:
+            snapshot_reason = template_miner.get_snapshot_reason("none", cluster_id)
+            if snapshot_reason:
+                template_miner.save_state(snapshot_reason)
+                template_miner.last_save_time = time.time()
+
+        return cluster_id, template, parameters
+
+    def mine(
+        self,
+        template_miner: TemplateMiner,
+        parameter_extractor: ParameterExtractor,
+        content: str,
+    ) -> tuple[int, str, list[str]]:
+        """
+        Cluster id, template and parameters of the content of a log - `add_log_message` on a miss.
+        """
+        start = perf_counter()
+        cached = self._lookup(template_miner, content)
+        if cached is not None:
+            self.hits += 1
+            self.hit_time += perf_counter() - start
+            return cached
+
+        result = template_miner.add_log_message(content)
+        cluster_id = result["cluster_id"]
+        template = result["template_mined"]
+        parameters = parameter_extractor.extract(cluster_id, template, content)
+
+        if result["change_type"] != "none":
+            self._cache.clear()
+            self.invalidations += 1
+        self._cache[content] = (cluster_id, template, parameters)
+
+        self.misses += 1
+        self.miss_time += perf_counter() - start
+        return cluster_id, template, parameters
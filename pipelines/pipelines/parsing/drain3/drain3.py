@@ -1,23 +1,30 @@
 import argparse
-import csv
 import logging
 import os
+import resource
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from os.path import dirname, exists, join
-from time import perf_counter
-from typing import Optional
+from time import perf_counter, process_time
+from typing import Any, Callable, Optional
 
 import pandas as pd
 from drain3 import TemplateMiner
 from drain3.template_miner_config import TemplateMinerConfig
 
+from ...utils.artifacts import ArtifactManifest
 from ...utils.functions import (
-    csv_dict_generator,
-    get_all_files_recursively,
     get_dataset_name,
+    get_structured_files_recursively,
+    structured_log_generator,
 )
 from ...utils.metrics_monitor import MetricsMonitor
+from ...utils.writers import OUTPUT_FORMATS, open_batch_writer, output_path
+from .content_cache import DEFAULT_CACHE_SIZE, ContentCache
+from .parameter_extractor import ParameterExtractor
+from .sharded import mine_sharded
+from .snapshots import create_template_miner
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="%(message)s")
@@ -26,8 +33,16 @@ INPUT_DIR = join("results", "parsing", "preprocessing")
 
 RESULTS_DIR = join("results", "parsing", "drain3")
 METRICS_DIR = join("metrics", "parsing", "drain3")
+SNAPSHOTS_DIR = join("snapshots", "parsing", "drain3")
+CONFIG_FILE = join(dirname(__file__), "drain3.ini")
 
 BATCH_SIZE = 50000
+# Separates parameters of the compact (`ids` encoding) CSV output - ASCII unit separator.
+PARAMETER_SEPARATOR = "\x1f"
+ENCODINGS = ("text", "ids")
+
+# Cluster id, template and parameters of a mined log.
+MinedLog = tuple[int, str, list[str]]
 
 
 def get_parser(parent_subparsers: Optional[argparse._SubParsersAction] = None):
@@ -38,84 +53,370 @@ def get_parser(parent_subparsers: Optional[argparse._SubParsersAction] = None):
         else parent_subparsers.add_parser("drain3", description=get_parser.__doc__)
     )
 
-    parser.set_defaults(func=main)
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="csv",
+        help="Output format - `parquet` stores typed, dictionary-encoded columns.",
+    )
 
-    return parser
+    parser.add_argument(
+        "--encoding",
+        choices=ENCODINGS,
+        default="text",
+        help="Row encoding - `ids` writes integer `EventId`s (templates to a separate table) "
+        "and compactly encoded parameters instead of `EventTemplate` strings.",
+    )
 
+    parser.add_argument(
+        "--content-cache",
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help="Number of recent log contents whose mining results are reused - `0` disables it.",
+    )
 
-def main(args: Optional[argparse.Namespace] = None):
-    os.makedirs(RESULTS_DIR, exist_ok=True)
-    os.makedirs(METRICS_DIR, exist_ok=True)
+    parser.add_argument(
+        "--fresh",
+        action="store_true",
+        help="Ignore snapshots - mine templates from scratch (snapshots are overwritten).",
+    )
 
-    if not args:
-        args = get_parser().parse_args()
+    parser.add_argument(
+        "--snapshot-interval",
+        type=float,
+        default=None,
+        metavar="MINUTES",
+        help="Minutes between snapshots of the miner state (`drain3.ini` value, by default).",
+    )
+
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes - datasets (and their shards) are mined concurrently.",
+    )
+
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Number of shards a single dataset is mined in - see `sharded`. Shards of a dataset "
+        "are mined in at most `--jobs` worker processes.",
+    )
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Mine all datasets - even the up-to-date ones (see `artifacts`).",
+    )
+
+    parser.set_defaults(func=main)
+
+    return parser
 
-    config_file = join(dirname(__file__), "drain3.ini")
+
+def load_config() -> TemplateMinerConfig:
     config = TemplateMinerConfig()
-    config.load(config_file)
+    config.load(CONFIG_FILE)
     # config.profiling_enabled = True
+    return config
+
+
+def encode_parameters(parameters: list[str]) -> str:
+    # Parameters are never empty - no parameters and a single empty one can't be confused.
+    return PARAMETER_SEPARATOR.join(parameters)
+
+
+def decode_parameters(encoded: str) -> list[str]:
+    return encoded.split(PARAMETER_SEPARATOR) if encoded else []
+
+
+def write_templates(
+    template_miner: TemplateMiner,
+    templates: dict[int, str],
+    sizes: dict[int, int],
+    templates_file: str,
+    output_format: str = "csv",
+):
+    """
+    Templates table of the `ids` encoding - `EventId`, `EventTemplate` (final - templates are
+    generalized as logs are mined) and `Size` (number of the mined logs) of every cluster.
+    """
+    with open_batch_writer(
+        templates_file, ["EventId", "EventTemplate", "Size"], output_format
+    ) as writer:
+        rows = []
+        for cluster_id in sorted(templates):
+            cluster = template_miner.drain.id_to_cluster.get(cluster_id)
+            rows.append(
+                {
+                    "EventId": cluster_id,
+                    # Clusters evicted (`max_clusters`) keep the last template they were seen with.
+                    "EventTemplate": (
+                        cluster.get_template() if cluster else templates[cluster_id]
+                    ),
+                    "Size": sizes[cluster_id],
+                }
+            )
+        writer.write_rows(rows)
+
+
+def write_mined_logs(
+    template_miner: TemplateMiner,
+    input_file: str,
+    mine: Callable[[str], MinedLog],
+    result_file: str,
+    output_format: str = "csv",
+    templates_file: Optional[str] = None,
+) -> int:
+    """
+    Writes structured logs of `input_file` to `result_file`, with the results of mining their
+    contents (`mine`) in place of `Content` - see `mine_templates`. Returns the number of logs.
+    """
+    log_count = 0
+    batch = []
+    encode_ids = templates_file is not None
+    templates: dict[int, str] = {}
+    sizes: dict[int, int] = {}
+
+    writer = None
+    try:
+        for structured_log in structured_log_generator(input_file):
+            # Unstructured
+            cluster_id, template, parameters = mine(structured_log["Content"])
+
+            if encode_ids:
+                templates[cluster_id] = template
+                sizes[cluster_id] = sizes.get(cluster_id, 0) + 1
+                structured_log["EventId"] = cluster_id
+                structured_log["Parameters"] = (
+                    encode_parameters(parameters)
+                    if output_format == "csv"
+                    else parameters
+                )
+            else:
+                structured_log["EventTemplate"] = template
+                structured_log["Parameters"] = parameters
+
+            del structured_log["Content"]
+            batch.append(structured_log)
+
+            if writer is None:
+                fieldnames = list(batch[0].keys())
+                writer = open_batch_writer(result_file, fieldnames, output_format)
+
+            log_count += 1
+
+            if log_count % BATCH_SIZE == 0:
+                writer.write_rows(batch)
+                batch = []
+
+        if len(batch) > 0 and writer is not None:
+            writer.write_rows(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if encode_ids:
+        write_templates(template_miner, templates, sizes, templates_file, output_format)
+
+    return log_count
+
+
+def mine_templates(
+    template_miner: TemplateMiner,
+    input_file: str,
+    result_file: str,
+    output_format: str = "csv",
+    content_cache: Optional[ContentCache] = None,
+    templates_file: Optional[str] = None,
+) -> int:
+    """
+    Mines templates of structured logs of `input_file` - writes them to `result_file` with
+    `EventTemplate` and `Parameters` in place of `Content`. Returns the number of logs.
+
+    With `templates_file` (`ids` encoding), rows have integer `EventId`s instead, templates are
+    written to `templates_file` (see `write_templates`), and CSV parameters are joined with
+    `PARAMETER_SEPARATOR` (Parquet stores them as lists either way).
+
+    Duplicate contents are served from `content_cache` (if given) - results are the same.
+    """
+    parameter_extractor = ParameterExtractor(template_miner)
+
+    def mine(content: str) -> MinedLog:
+        if content_cache is not None:
+            return content_cache.mine(template_miner, parameter_extractor, content)
+
+        result = template_miner.add_log_message(content)
+        cluster_id = result["cluster_id"]
+        template = result["template_mined"]
+        return (
+            cluster_id,
+            template,
+            parameter_extractor.extract(cluster_id, template, content),
+        )
+
+    return write_mined_logs(
+        template_miner, input_file, mine, result_file, output_format, templates_file
+    )
 
-    metrics_gathered = []
 
-    for input_file in get_all_files_recursively(INPUT_DIR):
-        template_miner = TemplateMiner(config=config)
-        dataset_name = get_dataset_name(input_file)
+def result_files(
+    dataset_name: str, args: argparse.Namespace
+) -> tuple[str, Optional[str]]:
+    """Result file of a dataset, and its templates file (`ids` encoding only)."""
+    result_file = output_path(join(RESULTS_DIR, dataset_name), args.format)
+    templates_file = (
+        output_path(join(RESULTS_DIR, f"{dataset_name}_templates"), args.format)
+        if args.encoding == "ids"
+        else None
+    )
+    return result_file, templates_file
 
-        if not exists(input_file):
-            raise ValueError(f"Preprocessed log file `{input_file}` doesn't exist!")
 
-        metrics_monitor = MetricsMonitor()
+def shard_workers(args: argparse.Namespace) -> int:
+    """Worker processes mining the shards of a dataset - `--jobs` caps all processes drain3 starts."""
+    return max(1, min(args.shards, args.jobs))
 
-        log_count = 0
-        batch = []
-        result_file = join(RESULTS_DIR, f"{dataset_name}.csv")
 
-        start = perf_counter()
+def _mine_dataset(input_file: str, args: argparse.Namespace) -> dict[str, Any]:
+    # Runs in a fresh worker process - `MetricsMonitor` samples (and `ru_maxrss` is the peak
+    # memory of) this dataset alone.
+    dataset_name = get_dataset_name(input_file)
 
-        with open(result_file, "w", newline="", encoding="utf-8") as csvfile:
-            writer = None
-            metrics_monitor.start()
+    if not exists(input_file):
+        raise ValueError(f"Preprocessed log file `{input_file}` doesn't exist!")
 
-            for structured_log in csv_dict_generator(input_file):
-                content = structured_log["Content"]  # Unstructured
-                structured_content = template_miner.add_log_message(content)
+    config = load_config()
+    if args.snapshot_interval is not None:
+        config.snapshot_interval_minutes = args.snapshot_interval
 
-                structured_log["EventTemplate"] = structured_content["template_mined"]
-                structured_log["Parameters"] = template_miner.get_parameter_list(
-                    structured_log["EventTemplate"], content
-                )
+    snapshot_file = join(SNAPSHOTS_DIR, f"{dataset_name}.snapshot")
+    template_miner = create_template_miner(config, snapshot_file, args.fresh)
 
-                del structured_log["Content"]
-                batch.append(structured_log)
+    # Shards are mined by worker processes of this one.
+    metrics_monitor = MetricsMonitor(include_children=args.shards > 1)
 
-                if writer is None:
-                    fieldnames = list(batch[0].keys())
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    writer.writeheader()
+    result_file, templates_file = result_files(dataset_name, args)
 
-                log_count += 1
+    start = perf_counter()
+    cpu_start = process_time()
+    metrics_monitor.start()
 
-                if log_count % BATCH_SIZE == 0:
-                    writer.writerows(batch)
-                    batch = []
+    # Shards mine already masked contents - there's nothing left for the cache to skip.
+    content_cache = (
+        ContentCache(args.content_cache)
+        if args.content_cache > 0 and args.shards <= 1
+        else None
+    )
 
-            if len(batch) > 0 and writer is not None:
-                writer.writerows(batch)
+    if args.shards > 1:
+        mined_logs = mine_sharded(
+            template_miner,
+            input_file,
+            args.shards,
+            snapshot_file,
+            args.fresh,
+            spill_dir=RESULTS_DIR,
+            max_workers=shard_workers(args),
+        )
+        log_count = write_mined_logs(
+            template_miner,
+            input_file,
+            lambda _: next(mined_logs),
+            result_file,
+            args.format,
+            templates_file,
+        )
+    else:
+        log_count = mine_templates(
+            template_miner,
+            input_file,
+            result_file,
+            args.format,
+            content_cache,
+            templates_file,
+        )
+    template_miner.snapshot()
+
+    end = perf_counter()
+
+    metrics = metrics_monitor.stop(log_count).to_dict("records")[0]
+    metrics["CPU Time [s]"] = round(process_time() - cpu_start, 4)
+    metrics["Peak Memory (MB)"] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 4
+    )
+    metrics["Dataset"] = dataset_name
+    metrics["Cluster Count"] = len(template_miner.drain.clusters)
+    metrics["Restored Clusters"] = template_miner.restored_cluster_count
+    if content_cache is not None:
+        metrics["Cache Hit Rate [%]"] = round(100 * content_cache.hit_rate, 4)
+        metrics["Cache Invalidations"] = content_cache.invalidations
+        metrics["Cache Speedup"] = round(content_cache.speedup, 4)
+
+    logger.info(
+        f"Dataset `{dataset_name}` finished preprocessing at an "
+        f"average rate of {log_count/(end-start)} [log/sec] - {log_count} logs in {end-start} seconds. "
+        f"Cluster count: {len(template_miner.drain.clusters)}"
+    )
 
-            end = perf_counter()
+    return metrics
 
-            metrics_df = metrics_monitor.stop(log_count)
-            metrics_df["Dataset"] = dataset_name
-            metrics_df["Cluster Count"] = len(template_miner.drain.clusters)
-            metrics_gathered.append(metrics_df)
 
-            logger.info(
-                f"Dataset `{dataset_name}` finished preprocessing at an "
-                f"average rate of {log_count/(end-start)} [log/sec] - {log_count} logs in {end-start} seconds. "
-                f"Cluster count: {len(template_miner.drain.clusters)}"
+def main(args: Optional[argparse.Namespace] = None):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    os.makedirs(SNAPSHOTS_DIR, exist_ok=True)
+
+    if not args:
+        args = get_parser().parse_args()
+
+    manifest = ArtifactManifest(RESULTS_DIR)
+    # Mined from a snapshot or not, outputs of the same logs are up to date - a skipped dataset's
+    # snapshot already has its clusters. The content cache doesn't change outputs, neither do
+    # shards - unless `max_clusters` evicts clusters (see `sharded`).
+    parameters = {"format": args.format, "encoding": args.encoding, "fresh": args.fresh}
+    if load_config().drain_max_clusters:
+        parameters["shards"] = args.shards
+
+    input_files = []
+    for input_file in get_structured_files_recursively(INPUT_DIR):
+        dataset_name = get_dataset_name(input_file)
+        if not args.force and manifest.is_up_to_date(
+            dataset_name, [input_file, CONFIG_FILE], parameters
+        ):
+            logger.info(f"Dataset `{dataset_name}` is up to date.")
+            continue
+        input_files.append(input_file)
+
+    # One dataset per worker process - metrics aren't inherited from previous ones. Datasets mined
+    # in shards share `--jobs` with the shard workers they start.
+    metrics_gathered = []
+    with ProcessPoolExecutor(
+        max_workers=max(1, args.jobs // shard_workers(args)), max_tasks_per_child=1
+    ) as executor:
+        futures = {
+            input_file: executor.submit(_mine_dataset, input_file, args)
+            for input_file in input_files
+        }
+        for input_file, future in futures.items():
+            metrics_gathered.append(future.result())
+
+            dataset_name = get_dataset_name(input_file)
+            manifest.record(
+                dataset_name,
+                [input_file, CONFIG_FILE],
+                parameters,
+                [file for file in result_files(dataset_name, args) if file],
             )
 
-    pd.concat(metrics_gathered, ignore_index=True).to_csv(
+    for dataset_name in manifest.prune():
+        logger.info(f"Stale results of `{dataset_name}` removed.")
+
+    if not metrics_gathered:
+        return
+
+    pd.DataFrame(metrics_gathered).to_csv(
         join(METRICS_DIR, f"drain3_{datetime.now().isoformat()}.csv"),
         index=False,
     )
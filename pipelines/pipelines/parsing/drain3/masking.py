@@ -0,0 +1,160 @@
+"""
+Masking engine for the `MASKING` rules of Drain3 - a drop-in replacement of `LogMasker`, with
+the same output (rules are applied in order, each to the output of the previous ones):
+    - rules are skipped when a message (masked by the previous rules) can't match them - every
+      rule's regex is analysed for what all its matches must contain (literals such as `:`, `0x`
+      or `executed cmd `, a digit), and messages without it are left alone, without a scan;
+    - the token boundaries of the rules (`((?<=[^A-Za-z0-9])|^)` and `((?=[^A-Za-z0-9])|$)`) are
+      rewritten to equivalent negative lookarounds, without alternations and capture groups,
+      which `re` tries at every position much faster.
+
+Rules aren't merged into a single alternation scan - it isn't equivalent: a scan claims text for
+the first rule matching at a position, while in order a higher-priority rule masks a match that
+starts later (`blk_-4118...` is a `NUM` in one scan, `-` and a `SEQ` in order), and inserted
+masks create token boundaries later rules match at.
+"""
+
+import re
+from re import _parser as sre_parse  # type: ignore[attr-defined]
+from typing import Any, Callable, Collection, Optional
+
+from drain3.masking import AbstractMaskingInstruction, LogMasker
+
+DIGIT = re.compile(r"\d")
+
+# Token boundaries of the Drain3 masking rules, and their equivalents.
+BOUNDARY_REWRITES = {
+    "((?<=[^A-Za-z0-9])|^)": "(?<![A-Za-z0-9])",
+    "((?=[^A-Za-z0-9])|$)": "(?![A-Za-z0-9])",
+}
+NUMBERED_REFERENCE = re.compile(r"\\[1-9]")
+
+
+def _requirements(parsed: Any) -> tuple[set[str], bool]:
+    """
+    What every match of a parsed regex contains - literals (runs of literal characters) and
+    whether a digit.
+    """
+    literals: set[str] = set()
+    digit = False
+    run = ""
+
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            run += chr(av)
+            continue
+        if run:
+            literals.add(run)
+            run = ""
+
+        if op is sre_parse.IN:
+            digit |= all(
+                (item_op is sre_parse.CATEGORY and item_av is sre_parse.CATEGORY_DIGIT)
+                or (item_op is sre_parse.LITERAL and DIGIT.match(chr(item_av)))
+                or (
+                    item_op is sre_parse.RANGE
+                    and ord("0") <= item_av[0]
+                    and item_av[1] <= ord("9")
+                )
+                for item_op, item_av in av
+            )
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            minimum, _, item = av
+            if minimum > 0:
+                item_literals, item_digit = _requirements(item)
+                literals |= item_literals
+                digit |= item_digit
+        elif op is sre_parse.SUBPATTERN:
+            _, add_flags, _, item = av
+            item_literals, item_digit = _requirements(item)
+            # Case-insensitive literals can be in the message in any case.
+            if not add_flags & re.IGNORECASE:
+                literals |= item_literals
+            digit |= item_digit
+        elif op is sre_parse.ASSERT:
+            # Positive lookarounds - the text is in the message, if not in the match.
+            item_literals, item_digit = _requirements(av[1])
+            literals |= item_literals
+            digit |= item_digit
+        elif op is sre_parse.BRANCH:
+            branches = [_requirements(branch) for branch in av[1]]
+            literals |= set.intersection(*(branch[0] for branch in branches))
+            digit |= all(branch[1] for branch in branches)
+
+    if run:
+        literals.add(run)
+    return literals, digit
+
+
+class _Rule:
+    __slots__ = ("instruction", "mask", "sub", "literals", "digit")
+
+    def __init__(self, instruction: AbstractMaskingInstruction, mask: str):
+        self.instruction = instruction
+        self.mask = mask
+        self.sub: Optional[Callable[[str, str], str]] = None
+        self.literals: tuple[str, ...] = ()
+        self.digit = False
+
+
+class MaskingEngine(LogMasker):
+    def __init__(
+        self,
+        masking_instructions: Collection[AbstractMaskingInstruction],
+        mask_prefix: str,
+        mask_suffix: str,
+    ):
+        super().__init__(masking_instructions, mask_prefix, mask_suffix)
+
+        self._rules = []
+        for instruction in masking_instructions:
+            rule = _Rule(instruction, mask_prefix + instruction.mask_with + mask_suffix)
+            regex = getattr(instruction, "regex", None)
+
+            if regex is not None:
+                pattern = regex.pattern
+                if not (
+                    NUMBERED_REFERENCE.search(pattern)
+                    or "\\" in rule.mask
+                    or regex.flags & re.MULTILINE
+                ):
+                    for boundary, rewrite in BOUNDARY_REWRITES.items():
+                        pattern = pattern.replace(boundary, rewrite)
+                rule.sub = re.compile(pattern, regex.flags).sub
+
+                literals, rule.digit = _requirements(sre_parse.parse(regex.pattern))
+                if not regex.flags & re.IGNORECASE:
+                    rule.literals = tuple(literals)
+
+            self._rules.append(rule)
+
+    @classmethod
+    def from_masker(cls, masker: LogMasker) -> "MaskingEngine":
+        return cls(masker.masking_instructions, masker.mask_prefix, masker.mask_suffix)
+
+    def mask(self, content: str) -> str:
+        # Requirements are checked against the content masked so far - a digit stays known to be
+        # absent until a mask could insert one.
+        has_digit: Optional[bool] = None
+        for rule in self._rules:
+            if rule.sub is None:
+                content = rule.instruction.mask(
+                    content, self.mask_prefix, self.mask_suffix
+                )
+                has_digit = None
+                continue
+
+            if rule.digit:
+                if has_digit is None:
+                    has_digit = DIGIT.search(content) is not None
+                if not has_digit:
+                    continue
+            if rule.literals and not all(
+                literal in content for literal in rule.literals
+            ):
+                continue
+
+            content = rule.sub(rule.mask, content)
+            if has_digit is False and DIGIT.search(rule.mask):
+                has_digit = None
+        return content
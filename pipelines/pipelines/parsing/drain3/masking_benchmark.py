@@ -0,0 +1,112 @@
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+from os.path import join
+from time import perf_counter
+from typing import Callable, Optional
+
+import pandas as pd
+from drain3 import TemplateMiner
+
+from ...utils.functions import (
+    get_dataset_name,
+    get_structured_files_recursively,
+    read_structured,
+    structured_chunk_generator,
+)
+from .drain3 import INPUT_DIR, METRICS_DIR, load_config
+from .masking import MaskingEngine
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="%(message)s")
+
+
+def get_parser(parent_subparsers: Optional[argparse._SubParsersAction] = None):
+    """Drain3 masking benchmark - masking engine against the stock `LogMasker`."""
+    parser = (
+        argparse.ArgumentParser(description=get_parser.__doc__)
+        if not parent_subparsers
+        else parent_subparsers.add_parser(
+            "drain3-masking", description=get_parser.__doc__
+        )
+    )
+
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Number of logs per dataset to mask (all, by default).",
+    )
+
+    parser.set_defaults(func=main)
+
+    return parser
+
+
+def time_masking(
+    mask: Callable[[str], str], contents: list[str]
+) -> tuple[list[str], float]:
+    start = perf_counter()
+    masked = [mask(content) for content in contents]
+    return masked, perf_counter() - start
+
+
+def main(args: Optional[argparse.Namespace] = None):
+    os.makedirs(METRICS_DIR, exist_ok=True)
+
+    if not args:
+        args = get_parser().parse_args()
+
+    stock_masker = TemplateMiner(config=load_config()).masker
+    masking_engine = MaskingEngine.from_masker(stock_masker)
+
+    metrics_gathered = []
+
+    for input_file in get_structured_files_recursively(INPUT_DIR):
+        dataset_name = get_dataset_name(input_file)
+        # Only the first `limit` logs are read - not the whole file.
+        structured_logs = (
+            next(
+                structured_chunk_generator(input_file, ["Content"], args.limit),
+                pd.DataFrame(columns=["Content"]),
+            )
+            if args.limit
+            else read_structured(input_file, ["Content"])
+        )
+        contents = structured_logs["Content"].fillna("").astype(str).tolist()
+
+        stock_masked, stock_time = time_masking(stock_masker.mask, contents)
+        engine_masked, engine_time = time_masking(masking_engine.mask, contents)
+        mismatches = sum(
+            stock != engine for stock, engine in zip(stock_masked, engine_masked)
+        )
+
+        metrics = {
+            "Dataset": dataset_name,
+            "Logs": len(contents),
+            "Stock Time [s]": round(stock_time, 4),
+            "Engine Time [s]": round(engine_time, 4),
+            "Speedup": round(stock_time / engine_time, 4) if engine_time else 0,
+            "Mismatches": mismatches,
+        }
+        metrics_gathered.append(metrics)
+
+        logger.info(f"Dataset `{dataset_name}` masking: {metrics}")
+        if mismatches:
+            logger.warning(
+                f"Dataset `{dataset_name}` - {mismatches} logs masked differently!"
+            )
+
+    if not metrics_gathered:
+        return
+
+    pd.DataFrame(metrics_gathered).to_csv(
+        join(METRICS_DIR, f"masking_{datetime.now().isoformat()}.csv"),
+        index=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
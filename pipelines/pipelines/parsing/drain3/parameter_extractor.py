@@ -0,0 +1,52 @@
+"""
+Parameter extraction of mined Drain3 templates - same parameters as
+`TemplateMiner.get_parameter_list`, which builds the extraction regex of the template (cached by
+template string), substitutes extra delimiters with uncompiled patterns and runs the regex through
+`re`'s module-level cache - for every log.
+
+Extractors here are compiled once per cluster and template version: a cluster's extractor is
+reused until its template changes (it's generalized), then rebuilt.
+"""
+
+import re
+from typing import Optional
+
+from cachetools import LRUCache
+from drain3 import TemplateMiner
+
+
+class ParameterExtractor:
+    def __init__(self, template_miner: TemplateMiner):
+        self._template_miner = template_miner
+        self._delimiters = [
+            re.compile(delimiter)
+            for delimiter in template_miner.config.drain_extra_delimiters
+        ]
+        # Cluster id -> (template, compiled extraction regex).
+        self._extractors: LRUCache = LRUCache(
+            maxsize=template_miner.config.parameter_extraction_cache_capacity
+        )
+
+    def _extractor(self, cluster_id: int, template: str) -> re.Pattern:
+        cached = self._extractors.get(cluster_id)
+        if cached is not None and cached[0] == template:
+            return cached[1]
+
+        # Approximate (non-exact) matching, like `get_parameter_list` - every capture group of the
+        # regex is a parameter, in the order of the template.
+        template_regex, _ = (
+            self._template_miner._get_template_parameter_extraction_regex(
+                template, False
+            )
+        )
+        extractor = re.compile(template_regex)
+        self._extractors[cluster_id] = (template, extractor)
+        return extractor
+
+    def extract(self, cluster_id: int, template: str, content: str) -> list[str]:
+        """Parameters of the content of a log, mined into the cluster with the template."""
+        for delimiter in self._delimiters:
+            content = delimiter.sub(" ", content)
+
+        match: Optional[re.Match] = self._extractor(cluster_id, template).match(content)
+        return list(match.groups()) if match is not None else []
@@ -0,0 +1,367 @@
+"""
+Sharded Drain3 mining of a single dataset - logs are partitioned by the first level of the Drain
+prefix tree, their (masked) token count: logs are only ever matched against (and generalize)
+clusters with the same token count, so every partition is mined independently, with the same
+clusters as mining the whole dataset in one process.
+
+Deeper levels (first tokens) don't partition logs - which child a token leads to (the token's
+own or the wildcard one) depends on the other tokens seen at that node.
+
+    - masking (map) - chunks of contents are masked and tokenized concurrently, spilled to disk
+      by token count;
+    - mining (reduce) - token counts are assigned to shards (largest first, to the least loaded
+      shard), every shard mines its token counts in a worker process, in the order of the logs;
+    - merging - shard trees and clusters are merged into one miner: new clusters are numbered
+      in the order they were created in (by log), which is what mining in one process numbers
+      them by, so cluster ids (`EventId`s) are the same too, and touched in the order of their
+      last logs, so is the LRU order (`max_clusters`) of the saved state.
+
+Results are the same as mining in one process unless `max_clusters` evicts clusters - the least
+recently used cluster of a shard isn't necessarily the one of the whole dataset. Clusters are only
+ever evicted once there are more than `max_clusters` of them (restored and created), so when the
+shards created that many, their results are dropped and the dataset is mined in one process instead.
+"""
+
+import heapq
+import logging
+import os
+import pickle
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from os.path import join
+from tempfile import TemporaryDirectory
+from typing import Any, Generator, Iterable, Optional
+
+from drain3 import TemplateMiner
+from drain3.drain import LogCluster, Node
+from drain3.template_miner_config import TemplateMinerConfig
+
+from ...utils.functions import structured_log_generator
+from .parameter_extractor import ParameterExtractor
+from .snapshots import create_template_miner
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 100000
+
+
+@dataclass
+class Shard:
+    # Token counts (first level keys of the prefix tree) of the shard.
+    keys: list[str]
+    subtrees: dict[str, Node]
+    # Clusters the shard's logs were added to.
+    clusters: list[LogCluster]
+    # Cluster id -> index of the log that created the cluster.
+    created: dict[int, int]
+    # Cluster id -> index of the last log added to the cluster (its LRU recency).
+    touched: dict[int, int]
+
+
+def _spill_file(spill_dir: str, chunk_index: int, key: str) -> str:
+    return join(spill_dir, f"{chunk_index}-{key}.pickle")
+
+
+def _mined_file(spill_dir: str, key: str) -> str:
+    return join(spill_dir, f"mined-{key}.pickle")
+
+
+def _load_batches(path: str) -> Generator[Any, None, None]:
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield from pickle.load(f)
+            except EOFError:
+                return
+
+
+def _mask_chunk(
+    config: TemplateMinerConfig,
+    spill_dir: str,
+    chunk_index: int,
+    first_index: int,
+    contents: list[str],
+) -> dict[str, int]:
+    """Masks a chunk of contents, spills them by token count - returns log counts by it."""
+    template_miner = create_template_miner(config)
+    partitions: dict[str, list[tuple[int, str, str]]] = {}
+    for index, content in enumerate(contents, start=first_index):
+        masked_content = template_miner.masker.mask(content)
+        key = str(len(template_miner.drain.get_content_as_tokens(masked_content)))
+        partitions.setdefault(key, []).append((index, content, masked_content))
+
+    for key, partition in partitions.items():
+        with open(_spill_file(spill_dir, chunk_index, key), "wb") as f:
+            pickle.dump(partition, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    return {key: len(partition) for key, partition in partitions.items()}
+
+
+def _mine_shard(
+    config: TemplateMinerConfig,
+    snapshot_file: Optional[str],
+    fresh: bool,
+    spill_dir: str,
+    chunk_count: int,
+    keys: list[str],
+) -> Shard:
+    # Restored clusters keep their ids - only the shard's token counts are mined (and returned).
+    template_miner = create_template_miner(config, snapshot_file, fresh)
+    # Only the merged state is saved.
+    template_miner.persistence_handler = None
+    drain = template_miner.drain
+    parameter_extractor = ParameterExtractor(template_miner)
+    created = {}
+    touched = {}
+
+    for key in keys:
+        with open(_mined_file(spill_dir, key), "wb") as f:
+            for chunk_index in range(chunk_count):
+                spill_file = _spill_file(spill_dir, chunk_index, key)
+                if not os.path.exists(spill_file):
+                    continue
+
+                with open(spill_file, "rb") as spill:
+                    partition = pickle.load(spill)
+                os.remove(spill_file)
+
+                mined = []
+                for index, content, masked_content in partition:
+                    cluster, change_type = drain.add_log_message(masked_content)
+                    if change_type == "cluster_created":
+                        created[cluster.cluster_id] = index
+                    touched[cluster.cluster_id] = index
+                    template = cluster.get_template()
+                    mined.append(
+                        (
+                            index,
+                            cluster.cluster_id,
+                            template,
+                            parameter_extractor.extract(
+                                cluster.cluster_id, template, content
+                            ),
+                        )
+                    )
+                pickle.dump(mined, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    owned = set(keys)
+    return Shard(
+        keys=keys,
+        subtrees={
+            key: node
+            for key, node in drain.root_node.key_to_child_node.items()
+            if key in owned
+        },
+        # Evicted ones (`max_clusters`) aside.
+        clusters=[
+            cluster
+            for cluster in map(drain.id_to_cluster.get, touched)
+            if cluster is not None
+        ],
+        created=created,
+        touched=touched,
+    )
+
+
+def assign_shards(counts: dict[str, int], shard_count: int) -> list[list[str]]:
+    """Token counts by shard - largest first, each to the least loaded shard (deterministic)."""
+    shards: list[list[str]] = [[] for _ in range(shard_count)]
+    loads = [0] * shard_count
+    for key in sorted(counts, key=lambda key: (-counts[key], int(key))):
+        shard_index = min(range(shard_count), key=lambda i: (loads[i], i))
+        shards[shard_index].append(key)
+        loads[shard_index] += counts[key]
+    return [sorted(keys, key=int) for keys in shards if keys]
+
+
+def _remap_tree(node: Node, cluster_ids: dict[int, int]):
+    nodes = [node]
+    while nodes:
+        node = nodes.pop()
+        node.cluster_ids = [
+            cluster_ids.get(cluster_id, cluster_id) for cluster_id in node.cluster_ids
+        ]
+        nodes.extend(node.key_to_child_node.values())
+
+
+def merge_shards(
+    template_miner: TemplateMiner, shards: list[Shard]
+) -> list[dict[int, int]]:
+    """
+    Merges mined shards into the template miner (restored from the same snapshot as them) -
+    returns shard cluster ids -> merged ones, by shard.
+    """
+    drain = template_miner.drain
+    restored_count = drain.clusters_counter
+
+    # Numbered in the order of the logs that created them, after the restored ones.
+    created = sorted(
+        (index, shard_index, cluster_id)
+        for shard_index, shard in enumerate(shards)
+        for cluster_id, index in shard.created.items()
+    )
+    cluster_ids: list[dict[int, int]] = [{} for _ in shards]
+    for number, (_, shard_index, cluster_id) in enumerate(created, start=1):
+        cluster_ids[shard_index][cluster_id] = restored_count + number
+
+    clusters: list[LogCluster] = []
+    touched: list[tuple[int, int]] = []
+    for shard, shard_cluster_ids in zip(shards, cluster_ids):
+        for key, subtree in shard.subtrees.items():
+            _remap_tree(subtree, shard_cluster_ids)
+            drain.root_node.key_to_child_node[key] = subtree
+        for cluster in shard.clusters:
+            last_index = shard.touched[cluster.cluster_id]
+            cluster.cluster_id = shard_cluster_ids.get(
+                cluster.cluster_id, cluster.cluster_id
+            )
+            clusters.append(cluster)
+            touched.append((last_index, cluster.cluster_id))
+
+    # Restored clusters keep their place, new ones are added in the order they were created
+    # in, then all are touched in the order of their last logs - the same (LRU) order as mining
+    # in one process.
+    for cluster in sorted(clusters, key=lambda cluster: cluster.cluster_id):
+        drain.id_to_cluster[cluster.cluster_id] = cluster
+    for _, cluster_id in sorted(touched):
+        # noinspection PyStatementEffect
+        drain.id_to_cluster[cluster_id]
+    drain.clusters_counter = restored_count + len(created)
+
+    return cluster_ids
+
+
+def _mined_logs(
+    spill_dir: str, shards: list[Shard], cluster_ids: list[dict[int, int]]
+) -> Generator[tuple[int, str, list[str]], None, None]:
+    def remapped(key: str, shard_cluster_ids: dict[int, int]) -> Iterable[Any]:
+        for index, cluster_id, template, parameters in _load_batches(
+            _mined_file(spill_dir, key)
+        ):
+            yield index, shard_cluster_ids.get(
+                cluster_id, cluster_id
+            ), template, parameters
+
+    merged = heapq.merge(
+        *(
+            remapped(key, shard_cluster_ids)
+            for shard, shard_cluster_ids in zip(shards, cluster_ids)
+            for key in shard.keys
+        ),
+        key=lambda mined: mined[0],
+    )
+    for _, cluster_id, template, parameters in merged:
+        yield cluster_id, template, parameters
+
+
+def _mine_in_process(
+    template_miner: TemplateMiner, input_file: str
+) -> Generator[tuple[int, str, list[str]], None, None]:
+    parameter_extractor = ParameterExtractor(template_miner)
+    for structured_log in structured_log_generator(input_file):
+        content = structured_log["Content"]
+        result = template_miner.add_log_message(content)
+        cluster_id = result["cluster_id"]
+        template = result["template_mined"]
+        yield cluster_id, template, parameter_extractor.extract(
+            cluster_id, template, content
+        )
+
+
+def mine_sharded(
+    template_miner: TemplateMiner,
+    input_file: str,
+    shard_count: int,
+    snapshot_file: Optional[str] = None,
+    fresh: bool = False,
+    spill_dir: Optional[str] = None,
+    max_workers: Optional[int] = None,
+) -> Generator[tuple[int, str, list[str]], None, None]:
+    """
+    Mines the contents of structured logs of `input_file` in `shard_count` shards, in (at most)
+    `max_workers` worker processes (one per shard, by default) - yields the cluster id, template
+    and parameters of every log, in order. Once all are yielded, `template_miner` (restored from
+    `snapshot_file`, unless `fresh`) has the merged clusters.
+
+    If clusters would be evicted (see above), the logs are mined in this process instead.
+    """
+    config = template_miner.config
+    max_workers = max_workers or shard_count
+
+    with TemporaryDirectory(dir=spill_dir) as spill_dir:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            counts: dict[str, int] = {}
+            pending: list[Future] = []
+
+            def collect(future: Future):
+                for key, count in future.result().items():
+                    counts[key] = counts.get(key, 0) + count
+
+            chunk_count = 0
+            first_index = 0
+            contents: list[str] = []
+            for structured_log in structured_log_generator(input_file):
+                contents.append(structured_log["Content"])
+                if len(contents) < CHUNK_SIZE:
+                    continue
+
+                pending.append(
+                    executor.submit(
+                        _mask_chunk,
+                        config,
+                        spill_dir,
+                        chunk_count,
+                        first_index,
+                        contents,
+                    )
+                )
+                chunk_count += 1
+                first_index += len(contents)
+                contents = []
+                # Bounded read-ahead - chunks aren't read (much) faster than they're masked.
+                while len(pending) > 2 * max_workers:
+                    collect(pending.pop(0))
+
+            if contents:
+                pending.append(
+                    executor.submit(
+                        _mask_chunk,
+                        config,
+                        spill_dir,
+                        chunk_count,
+                        first_index,
+                        contents,
+                    )
+                )
+                chunk_count += 1
+            for future in pending:
+                collect(future)
+
+            futures = [
+                executor.submit(
+                    _mine_shard,
+                    config,
+                    snapshot_file,
+                    fresh,
+                    spill_dir,
+                    chunk_count,
+                    keys,
+                )
+                for keys in assign_shards(counts, shard_count)
+            ]
+            shards = [future.result() for future in futures]
+
+        max_clusters = config.drain_max_clusters
+        cluster_count = len(template_miner.drain.id_to_cluster) + sum(
+            len(shard.created) for shard in shards
+        )
+        if max_clusters and cluster_count > max_clusters:
+            logger.warning(
+                f"Mining `{input_file}` in shards evicts clusters ({cluster_count} clusters, "
+                f"`max_clusters` = {max_clusters}) - mining it in one process instead."
+            )
+            yield from _mine_in_process(template_miner, input_file)
+            return
+
+        cluster_ids = merge_shards(template_miner, shards)
+        yield from _mined_logs(spill_dir, shards, cluster_ids)
@@ -0,0 +1,76 @@
+"""
+Drain3 state snapshots - a template miner restores the clusters learned by previous runs (same
+cluster ids, no warm-up) and saves them as it mines:
+    - every `snapshot_interval_minutes` and when mining is done - not on every created cluster or
+      changed template, as `TemplateMiner` does, since each snapshot serializes the whole state;
+    - compressed, if `compress_state` is set (see `drain3.ini`);
+    - written aside and renamed - an interrupted run never leaves a truncated snapshot.
+
+Restored clusters start with no logs (`size`) - every run mines its input file from the first log
+again (e.g. a preprocessed log appended to since the last run), so sizes only count the logs of that
+file, not those of every run.
+"""
+
+import os
+import time
+from typing import Optional
+
+from drain3 import TemplateMiner
+from drain3.file_persistence import FilePersistence
+from drain3.template_miner_config import TemplateMinerConfig
+
+from .masking import MaskingEngine
+
+
+class AtomicFilePersistence(FilePersistence):
+    def save_state(self, state: bytes):
+        temporary_file = f"{self.file_path}.tmp"
+        with open(temporary_file, "wb") as f:
+            f.write(state)
+        os.replace(temporary_file, self.file_path)
+
+
+class SnapshotTemplateMiner(TemplateMiner):
+    def __init__(
+        self,
+        snapshot_file: Optional[str] = None,
+        config: Optional[TemplateMinerConfig] = None,
+        fresh: bool = False,
+    ):
+        persistence_handler = (
+            AtomicFilePersistence(snapshot_file) if snapshot_file else None
+        )
+        # Without a handler, nothing's loaded - it's attached afterwards, only to save.
+        super().__init__(
+            persistence_handler=None if fresh else persistence_handler, config=config
+        )
+        self.persistence_handler = persistence_handler
+        self.restored_cluster_count = len(self.drain.clusters)
+        for cluster in self.drain.clusters:
+            cluster.size = 0
+
+    def get_snapshot_reason(self, change_type: str, cluster_id: int) -> Optional[str]:
+        elapsed_time = time.time() - self.last_save_time
+        if elapsed_time >= self.config.snapshot_interval_minutes * 60:
+            return "periodic"
+        return None
+
+    def snapshot(self, snapshot_reason: str = "done"):
+        if self.persistence_handler is None:
+            return
+        self.save_state(snapshot_reason)
+        self.last_save_time = time.time()
+
+
+def create_template_miner(
+    config: TemplateMinerConfig,
+    snapshot_file: Optional[str] = None,
+    fresh: bool = False,
+) -> SnapshotTemplateMiner:
+    """
+    Template miner masking with `MaskingEngine` - same masks as Drain3's, faster. Restores its
+    state from `snapshot_file` (unless `fresh`), and saves it there.
+    """
+    template_miner = SnapshotTemplateMiner(snapshot_file, config, fresh)
+    template_miner.masker = MaskingEngine.from_masker(template_miner.masker)
+    return template_miner
@@ -1,16 +1,19 @@
 import argparse
 
-from . import preprocessing
-from .drain import drain
-from .drain3 import drain3
+from . import benchmark, preprocessing
+from .drain import drain, sweep
+from .drain3 import drain3, masking_benchmark
 
 
 def main():
     parser = argparse.ArgumentParser(description="Main CLI for log parsing.")
     subparsers = parser.add_subparsers(dest="parsing_utility", required=True)
 
+    benchmark.get_parser(subparsers)
     drain.get_parser(subparsers)
+    sweep.get_parser(subparsers)
     drain3.get_parser(subparsers)
+    masking_benchmark.get_parser(subparsers)
     preprocessing.get_parser(subparsers)
 
     args = parser.parse_args()
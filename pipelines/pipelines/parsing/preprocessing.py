@@ -1,22 +1,40 @@
 import argparse
-import csv
 import logging
 import os
 import re
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import islice, repeat
 from os.path import exists, join
+from tempfile import TemporaryDirectory
 from time import perf_counter
-from typing import Optional
+from typing import Iterable, Optional
 
 import pandas as pd
 
-from ..utils.functions import get_dataset_name, log_generator
+from ..utils.checkpoints import Checkpoint, config_hash, file_fingerprint
+from ..utils.compression import compression, find_log_file
+from ..utils.functions import (
+    get_dataset_name,
+    log_generator,
+    reader_report,
+    split_file,
+)
 from ..utils.metrics_monitor import MetricsMonitor
+from ..utils.writers import (
+    OUTPUT_FORMATS,
+    BatchWriter,
+    open_batch_writer,
+    output_path,
+)
+from .timestamps import TimestampConverter
 
 RESULTS_DIR = join("results", "parsing", "preprocessing")
 METRICS_DIR = join("metrics", "parsing", "preprocessing")
 BATCH_SIZE = 10000
+# More shards than workers - evens out the load when shards differ in cost.
+SHARDS_PER_JOB = 4
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="%(message)s")
@@ -48,6 +66,32 @@ def get_parser(parent_subparsers: Optional[argparse._SubParsersAction] = None):
         default="all",
     )
 
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes - each log file is split into byte ranges processed in parallel.",
+    )
+
+    parser.add_argument(
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="csv",
+        help="Output format - `parquet` stores typed, dictionary-encoded columns.",
+    )
+
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Ignore checkpoints - preprocess whole log files instead of only their new tails.",
+    )
+
+    parser.add_argument(
+        "--reader-report",
+        action="store_true",
+        help="Instead of preprocessing, benchmark the log readers on each dataset.",
+    )
+
     parser.set_defaults(func=main)
 
     return parser
@@ -72,43 +116,165 @@ class Preprocessor:
 
         self.log_pattern = re.compile(log_pattern)
         self.timestamp_format = timestamp_format
+        self.timestamp_converter = (
+            TimestampConverter(timestamp_format) if timestamp_format else None
+        )
         self.strict = strict
 
-    @staticmethod
-    def __convert_to_iso8601(timestamp: str, format: str) -> str:
-        try:
-            dt = (
-                datetime.fromtimestamp(float(timestamp))
-                if format.lower() == "unix"
-                else datetime.strptime(timestamp, format)
-            )
-            return dt.isoformat() + "Z"  # Append 'Z' to indicate UTC
-        except ValueError as e:
-            raise ValueError(
-                f"Timestamp `{timestamp}` does not match format `{format}`: {e}"
-            )
+    @property
+    def fieldnames(self) -> list[str]:
+        return list(self.log_pattern.groupindex.keys())
+
+    def extract(self, raw_log: str) -> Optional[dict[str, str]]:
+        """Fields of a (stripped) log, `None` if it doesn't match the log pattern."""
+        matched = self.log_pattern.match(raw_log)
+        return matched.groupdict() if matched else None
+
+    def _unmatched_error(self, raw_log: str) -> ValueError:
+        return ValueError(
+            f"Log `{raw_log}` can't be matched with pattern `{self.log_pattern}`."
+        )
 
     def preprocess(self, raw_log: str) -> dict[str, str]:
         raw_log = raw_log.strip()
-        matched = self.log_pattern.match(raw_log)
+        structured = self.extract(raw_log)
 
-        if matched is None:
+        if structured is None:
             if self.strict:
-                raise ValueError(
-                    f"Log `{raw_log}` can't be matched with pattern `{self.log_pattern}`."
-                )
+                raise self._unmatched_error(raw_log)
             return {"Content": raw_log}
 
-        structured = matched.groupdict()
-
-        if self.timestamp_format:
-            structured["Timestamp"] = Preprocessor.__convert_to_iso8601(
-                structured["Timestamp"],
-                self.timestamp_format,
+        if self.timestamp_converter:
+            structured["Timestamp"] = self.timestamp_converter.convert(
+                structured["Timestamp"]
             )
 
         return structured
 
+    def preprocess_batch(
+        self, raw_logs: Iterable[str]
+    ) -> tuple[dict[str, list[Optional[str]]], list[bool]]:
+        """
+        Preprocesses a batch of logs into columns keyed by field name - no dictionary per log.
+
+        Also returns the mask of matched logs. Unmatched logs only have `Content` (the whole log),
+        their other fields are `None`.
+        """
+        raw_logs = [raw_log.strip() for raw_log in raw_logs]
+        match = self.log_pattern.match
+        # Match objects are indexed by field name - no `groupdict` per log.
+        extracted = [match(raw_log) for raw_log in raw_logs]
+        matched = [fields is not None for fields in extracted]
+
+        columns = {
+            name: [fields[name] if fields else None for fields in extracted]
+            for name in self.fieldnames
+        }
+
+        if not all(matched):
+            if self.strict:
+                raise self._unmatched_error(raw_logs[matched.index(False)])
+
+            content = columns["Content"]
+            for i, is_matched in enumerate(matched):
+                if not is_matched:
+                    content[i] = raw_logs[i]
+
+        if self.timestamp_converter:
+            columns["Timestamp"] = self.timestamp_converter.convert_batch(
+                columns["Timestamp"]
+            )
+
+        return columns, matched
+
+
+def write_preprocessed(
+    preprocessor: Preprocessor,
+    raw_logs: Iterable[str],
+    writer: BatchWriter,
+) -> tuple[int, int]:
+    """Preprocesses `raw_logs` into `writer` in batches, returns `(log_count, unmatched_count)`."""
+    log_count = 0
+    unmatched_count = 0
+    raw_logs = iter(raw_logs)
+
+    while batch := list(islice(raw_logs, BATCH_SIZE)):
+        columns, matched = preprocessor.preprocess_batch(batch)
+        writer.write_columns(columns)
+
+        log_count += len(batch)
+        unmatched_count += matched.count(False)
+
+    return log_count, unmatched_count
+
+
+def _preprocess_range(
+    logfile: str,
+    start: int,
+    end: int,
+    log_pattern: str,
+    timestamp_format: Optional[str],
+    strict: bool,
+    shard_file: str,
+    output_format: str,
+) -> tuple[int, int]:
+    # Runs in a worker process - everything passed in has to be picklable.
+    preprocessor = Preprocessor(log_pattern, timestamp_format, strict=strict)
+    with open_batch_writer(
+        shard_file, preprocessor.fieldnames, output_format, write_header=False
+    ) as writer:
+        return write_preprocessed(
+            preprocessor, log_generator(logfile, start, end), writer
+        )
+
+
+def preprocess_parallel(
+    preprocessor: Preprocessor,
+    logfile: str,
+    writer: BatchWriter,
+    jobs: int,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> tuple[int, int]:
+    """
+    Splits `logfile` (its byte range `[start, end)`) into newline-aligned byte ranges, preprocesses
+    them in a process pool and stitches the resulting shards into `writer` in the original order.
+    """
+    ranges = split_file(logfile, jobs * SHARDS_PER_JOB, start, end)
+    log_count = 0
+    unmatched_count = 0
+
+    with TemporaryDirectory(dir=RESULTS_DIR) as shards_dir, ProcessPoolExecutor(
+        max_workers=jobs
+    ) as executor:
+        shard_files = [
+            output_path(join(shards_dir, str(i)), writer.extension)
+            for i in range(len(ranges))
+        ]
+        results = executor.map(
+            _preprocess_range,
+            repeat(logfile),
+            [start for start, _ in ranges],
+            [end for _, end in ranges],
+            repeat(preprocessor.log_pattern.pattern),
+            repeat(preprocessor.timestamp_format),
+            repeat(preprocessor.strict),
+            shard_files,
+            repeat(writer.extension),
+        )
+
+        # `map` yields in submission order, so shards can be appended as soon as they're done.
+        for shard_file, (shard_log_count, shard_unmatched_count) in zip(
+            shard_files, results
+        ):
+            writer.append_file(shard_file)
+            os.remove(shard_file)
+
+            log_count += shard_log_count
+            unmatched_count += shard_unmatched_count
+
+    return log_count, unmatched_count
+
 
 # Only this, first task (preprocessing), has dataset-specific inputs; this has been done to facilitate automatic
 # downstream tasks. Basically, only this phase needs dataset-specific parameter tweaking, all downstream tasks
@@ -228,6 +394,21 @@ def main(args: Optional[argparse.Namespace] = None):
         }
     )
 
+    if args.reader_report:
+        reports = []
+        for logfile, _, _ in datasets_to_process.values():
+            logfile = find_log_file(logfile)
+            dataset_name = get_dataset_name(logfile)
+            report = reader_report(logfile)
+            reports.append({"Dataset": dataset_name, **report})
+            logger.info(f"Dataset `{dataset_name}` reader report: {report}")
+
+        pd.DataFrame(reports).to_csv(
+            join(METRICS_DIR, f"reader_{datetime.now().isoformat()}.csv"),
+            index=False,
+        )
+        return
+
     metrics_gathered = []
 
     for (
@@ -240,56 +421,115 @@ def main(args: Optional[argparse.Namespace] = None):
             timestamp_format,
             strict=args.strict,
         )
+        # Compressed logs (e.g. `HDFS_full.log.gz`) are decompressed on the fly.
+        logfile = find_log_file(logfile)
+        log_compression = compression(logfile)
         dataset_name = get_dataset_name(logfile)
-        metrics_monitor = MetricsMonitor()
-
-        log_count = 0
-        unmatched_count = 0
-        start = perf_counter()
 
-        batch = []
-        result_file = join(RESULTS_DIR, f"{dataset_name}.csv")
-        with open(result_file, "w", newline="", encoding="utf-8") as csvfile:
-            writer = None
-
-            metrics_monitor.start()
-            for raw_log in log_generator(logfile):
-                batch.append(preprocessor.preprocess(raw_log))
+        jobs = args.jobs
+        if log_compression and jobs > 1:
+            logger.info(
+                f"Dataset `{dataset_name}` is compressed and can't be split into byte ranges "
+                f"- preprocessing it in a single process."
+            )
+            jobs = 1
+        metrics_monitor = MetricsMonitor(include_children=jobs > 1)
+
+        result_file = output_path(join(RESULTS_DIR, dataset_name), args.format)
+        checkpoint_file = f"{result_file}.checkpoint.json"
+        dataset_config_hash = config_hash(log_pattern, timestamp_format, args.format)
+
+        # Only the tail appended since the last run is preprocessed, if the log has merely grown.
+        # Compressed logs have no byte offsets to resume at - they're always preprocessed whole.
+        checkpoint = (
+            None
+            if args.rebuild or log_compression
+            else Checkpoint.load(checkpoint_file)
+        )
+        resume_offset = (
+            checkpoint.resume_offset(logfile, dataset_config_hash, result_file)
+            if checkpoint
+            else None
+        )
+        # Taken up front - whatever gets appended to the log meanwhile is left for the next run.
+        log_size = None if log_compression else os.path.getsize(logfile)
 
-                if len(batch[-1].keys()) == 1:
-                    unmatched_count += 1
+        if resume_offset is not None and resume_offset == log_size:
+            logger.info(f"Dataset `{dataset_name}` is up to date.")
+            continue
 
-                if writer is None:
-                    fieldnames = list(batch[0].keys())
-                    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                    writer.writeheader()
+        if checkpoint and resume_offset is not None:
+            logger.info(
+                f"Dataset `{dataset_name}` - resuming preprocessing at byte {resume_offset}."
+            )
+            if args.format == "csv":
+                # Drops whatever an interrupted run may have appended after the checkpoint.
+                os.truncate(result_file, checkpoint.output_size)
 
-                log_count += 1
+        start_offset = resume_offset or 0
+        start = perf_counter()
 
-                if log_count % BATCH_SIZE == 0:
-                    writer.writerows(batch)
-                    batch = []
+        with open_batch_writer(
+            result_file,
+            preprocessor.fieldnames,
+            args.format,
+            append=resume_offset is not None,
+        ) as writer:
+            metrics_monitor.start()
 
-            if len(batch) > 0 and writer is not None:
-                writer.writerows(batch)
+            if jobs > 1:
+                log_count, unmatched_count = preprocess_parallel(
+                    preprocessor, logfile, writer, jobs, start_offset, log_size
+                )
+            else:
+                log_count, unmatched_count = write_preprocessed(
+                    preprocessor,
+                    log_generator(logfile, start_offset, log_size),
+                    writer,
+                )
 
             metrics_df = metrics_monitor.stop(log_count)
             metrics_df["Dataset"] = dataset_name
-            metrics_df["Unmatched logs"] = round(unmatched_count * 100.0 / log_count, 4)
+            metrics_df["Unmatched logs"] = round(
+                unmatched_count * 100.0 / max(log_count, 1), 4
+            )
+            metrics_df["Jobs"] = jobs
+            metrics_df["Compression"] = log_compression
+            metrics_df["Format"] = args.format
+            metrics_df["Resumed at"] = start_offset
 
             metrics_gathered.append(metrics_df)
 
+        if not log_compression:
+            total_log_count = log_count
+            total_unmatched_count = unmatched_count
+            if checkpoint and resume_offset is not None:
+                total_log_count += checkpoint.log_count
+                total_unmatched_count += checkpoint.unmatched_count
+
+            Checkpoint(
+                log_file=logfile,
+                offset=log_size,
+                fingerprint=file_fingerprint(logfile, log_size),
+                config_hash=dataset_config_hash,
+                output_file=result_file,
+                output_size=os.path.getsize(result_file),
+                log_count=total_log_count,
+                unmatched_count=total_unmatched_count,
+            ).save(checkpoint_file)
+
         end = perf_counter()
         logger.info(
             f"Dataset `{dataset_name}` finished preprocessing at an "
             f"average rate of {log_count/(end-start)} [log/sec] - {log_count} logs in {end-start} seconds. "
-            f"Unmatched logs: {unmatched_count * 100. / log_count} [%]"
+            f"Unmatched logs: {unmatched_count * 100. / max(log_count, 1)} [%]"
         )
 
-    pd.concat(metrics_gathered, ignore_index=True).to_csv(
-        join(METRICS_DIR, f"preprocessing_{datetime.now().isoformat()}.csv"),
-        index=False,
-    )
+    if metrics_gathered:
+        pd.concat(metrics_gathered, ignore_index=True).to_csv(
+            join(METRICS_DIR, f"preprocessing_{datetime.now().isoformat()}.csv"),
+            index=False,
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,148 @@
+"""
+Synthetic log corpora, modelled on the Loghub 2k sample files:
+    - templates - content tokens containing digits are parameters, the rest is kept verbatim;
+    - templates are sampled with their frequencies in the sample file;
+    - parameters are sampled from values observed at the same position of the same template,
+      with their digits shuffled - values keep their shape (IPs, block ids, ...), but aren't
+      limited to the few observed ones;
+    - headers (everything before the content) are sampled from the sample file as a whole, so they
+      stay consistent (e.g. timestamps) and match dataset-specific patterns.
+"""
+
+import os
+import random
+import re
+from dataclasses import dataclass
+from os.path import exists, join
+from typing import Any, Generator, Optional
+
+from logparser import Drain
+
+from ..utils.functions import log_generator
+from .drain.configs.configs_2k import CONFIGS_2K
+
+SYNTHETIC_DIR = join("data", "synthetic")
+# Random digit permutations parameter values are translated with.
+DIGIT_PERMUTATIONS = 64
+SYNTHESIS_BATCH_SIZE = 100000
+
+
+@dataclass
+class CorpusModel:
+    headers: list[str]
+    # Template tokens - `None` marks a parameter.
+    templates: list[tuple[Optional[str], ...]]
+    template_counts: list[int]
+    # Observed values of each template's parameters, by token position.
+    parameters: list[dict[int, list[str]]]
+
+
+def sample_file(dataset: str) -> str:
+    config, log_file = CONFIGS_2K[dataset]
+    return join(config.indir, log_file)
+
+
+def content_regex(dataset: str) -> re.Pattern:
+    config, _ = CONFIGS_2K[dataset]
+    _, regex = Drain.LogParser(config.log_format).generate_logformat_regex(
+        config.log_format
+    )
+    return regex
+
+
+def learn(raw_logs: Generator[str, Any, Any], regex: re.Pattern) -> CorpusModel:
+    """Models logs matched by `regex` (log format regex with a `Content` group)."""
+    headers = []
+    template_indices: dict[tuple[Optional[str], ...], int] = {}
+    template_counts: list[int] = []
+    parameters: list[dict[int, list[str]]] = []
+
+    for raw_log in raw_logs:
+        raw_log = raw_log.strip()
+        match = regex.search(raw_log)
+        if match is None:
+            continue
+
+        headers.append(raw_log[: match.start("Content")])
+        tokens = match.group("Content").split()
+        template = tuple(
+            None if any(c.isdigit() for c in token) else token for token in tokens
+        )
+
+        index = template_indices.setdefault(template, len(template_counts))
+        if index == len(template_counts):
+            template_counts.append(0)
+            parameters.append({})
+        template_counts[index] += 1
+        for position, token in enumerate(tokens):
+            if template[position] is None:
+                parameters[index].setdefault(position, []).append(token)
+
+    if not headers:
+        raise ValueError(f"No log matched the log format regex `{regex.pattern}`.")
+
+    return CorpusModel(
+        headers=headers,
+        templates=list(template_indices),
+        template_counts=template_counts,
+        parameters=parameters,
+    )
+
+
+def synthesize(
+    model: CorpusModel, line_count: int, seed: int = 0
+) -> Generator[str, Any, Any]:
+    rng = random.Random(seed)
+    digit_tables = []
+    for _ in range(DIGIT_PERMUTATIONS):
+        digits = list("0123456789")
+        rng.shuffle(digits)
+        digit_tables.append(str.maketrans("0123456789", "".join(digits)))
+
+    cumulative_counts = []
+    total = 0
+    for count in model.template_counts:
+        total += count
+        cumulative_counts.append(total)
+
+    choice = rng.choice
+    template_indices = range(len(model.templates))
+    for batch_start in range(0, line_count, SYNTHESIS_BATCH_SIZE):
+        for index in rng.choices(
+            template_indices,
+            cum_weights=cumulative_counts,
+            k=min(SYNTHESIS_BATCH_SIZE, line_count - batch_start),
+        ):
+            parameters = model.parameters[index]
+            table = choice(digit_tables)
+            content = " ".join(
+                (
+                    token
+                    if token is not None
+                    else choice(parameters[position]).translate(table)
+                )
+                for position, token in enumerate(model.templates[index])
+            )
+            yield f"{choice(model.headers)}{content}\n"
+
+
+def synthetic_file(dataset: str, line_count: int, seed: int = 0) -> str:
+    return join(SYNTHETIC_DIR, dataset, f"{dataset}_{line_count}_{seed}.log")
+
+
+def write_corpus(dataset: str, line_count: int, seed: int = 0) -> str:
+    """Synthesizes `line_count` logs of a dataset (once - corpora are reused), returns the file."""
+    corpus_file = synthetic_file(dataset, line_count, seed)
+    if exists(corpus_file):
+        return corpus_file
+
+    model = learn(log_generator(sample_file(dataset)), content_regex(dataset))
+
+    os.makedirs(join(SYNTHETIC_DIR, dataset), exist_ok=True)
+    # Written aside and renamed - an interrupted run never leaves a truncated corpus to be reused.
+    temporary_file = f"{corpus_file}.tmp"
+    with open(temporary_file, "w") as f:
+        f.writelines(synthesize(model, line_count, seed))
+    os.replace(temporary_file, corpus_file)
+
+    return corpus_file
@@ -0,0 +1,258 @@
+"""
+Timestamp conversion for log preprocessing:
+    - fast path for fixed-width `strptime` formats (no `strptime` call per line);
+    - date/hour prefix cache - consecutive timestamps sharing it only parse minutes/seconds;
+    - batch conversion of whole chunks of timestamps.
+
+Output is always identical to `datetime.strptime(timestamp, format).isoformat() + "Z"`
+(`datetime.fromtimestamp` for the "UNIX" format) - anything the fast path doesn't
+understand falls back to exactly that.
+"""
+
+import calendar
+import re
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+UNIX_FORMAT = "unix"
+
+# Directives understood by the fast path: directive -> (regex, field, width).
+_DIRECTIVES = {
+    "Y": (r"[0-9]{4}", "year", 4),
+    "y": (r"[0-9]{2}", "short_year", 2),
+    "m": (r"[0-9]{2}", "month", 2),
+    "b": (r"[A-Za-z]{3}", "month_name", 3),
+    "d": (r"[0-9]{2}", "day", 2),
+    "a": (r"[A-Za-z]{3}", "weekday_name", 3),
+    "H": (r"[0-9]{2}", "hour", 2),
+    "M": (r"[0-9]{2}", "minute", 2),
+    "S": (r"[0-9]{2}", "second", 2),
+    "f": (r"[0-9]{1,6}", "fraction", None),
+}
+_DATE_HOUR_FIELDS = {"year", "short_year", "month", "month_name", "day", "hour"}
+_TIME_FIELDS = {"minute", "second", "fraction"}
+
+# Same (locale dependent) names `strptime` matches case-insensitively.
+_MONTH_NAMES = {name.lower(): i for i, name in enumerate(calendar.month_abbr) if name}
+_WEEKDAY_NAMES = {name.lower() for name in calendar.day_abbr}
+
+
+def _compile_format(
+    format: str,
+) -> Optional[tuple[re.Pattern, int, Optional[re.Pattern]]]:
+    """
+    Compiles a `strptime` format into a regex of fixed-width fields.
+
+    Returns `(pattern, prefix_length, tail_pattern)` or `None` if the format has directives
+    the fast path doesn't support. `prefix_length` is the length of the leading part holding
+    every date/hour field, `tail_pattern` matches the rest (`None` if there is no such prefix).
+    """
+    parts: list[tuple[str, Optional[str], Optional[int]]] = []  # (regex, field, width)
+    i = 0
+    while i < len(format):
+        if format[i] == "%":
+            directive = format[i + 1 : i + 2]
+            if directive == "%":
+                parts.append((re.escape("%"), None, 1))
+            elif directive in _DIRECTIVES:
+                regex, field, width = _DIRECTIVES[directive]
+                parts.append((f"(?P<{field}>{regex})", field, width))
+            else:
+                return None
+            i += 2
+        else:
+            parts.append((re.escape(format[i]), None, 1))
+            i += 1
+
+    fields = [field for _, field, _ in parts if field]
+    if len(fields) != len(set(fields)):
+        return None
+    pattern = re.compile("".join(regex for regex, _, _ in parts))
+
+    # Prefix cache needs every date/hour field in a fixed-width prefix, followed only by time fields.
+    split = max(
+        (i for i, (_, field, _) in enumerate(parts) if field in _DATE_HOUR_FIELDS),
+        default=-1,
+    )
+    prefix, tail = parts[: split + 1], parts[split + 1 :]
+    prefix_fields = {field for _, field, _ in prefix if field}
+    tail_fields = {field for _, field, _ in tail if field}
+    if (
+        split < 0
+        or not prefix_fields <= _DATE_HOUR_FIELDS | {"weekday_name"}
+        or not tail_fields <= _TIME_FIELDS
+        or any(width is None for _, _, width in prefix)
+    ):
+        return pattern, 0, None
+
+    prefix_length = sum(width for _, _, width in prefix)  # type: ignore
+    tail_pattern = re.compile("".join(regex for regex, _, _ in tail))
+    return pattern, prefix_length, tail_pattern
+
+
+class TimestampConverter:
+    """Converts timestamps of a single format into ISO-8601 UTC (`Z` suffixed) strings."""
+
+    def __init__(self, format: str):
+        self.format = format
+        self._unix = format.lower() == UNIX_FORMAT
+
+        self._last_timestamp: Optional[str] = None
+        self._last_converted = ""
+
+        # Date/hour prefix cache.
+        self._prefix: Optional[str] = None
+        self._iso_prefix = ""
+
+        # UNIX timestamps - local time prefixes of the cached UTC hour.
+        self._hour_start: Optional[int] = None
+        self._hour_base_offset = 0
+        self._hour_prefixes: Optional[tuple[str, str]] = None
+
+        compiled = None if self._unix else _compile_format(format)
+        self._pattern, self._prefix_length, self._tail_pattern = compiled or (
+            None,
+            0,
+            None,
+        )
+
+    def convert(self, timestamp: str) -> str:
+        if timestamp == self._last_timestamp:
+            return self._last_converted
+
+        converted = (
+            self._convert_unix(timestamp)
+            if self._unix
+            else self._convert_formatted(timestamp)
+        )
+
+        self._last_timestamp = timestamp
+        self._last_converted = converted
+        return converted
+
+    __call__ = convert
+
+    def convert_batch(self, timestamps: Iterable[Optional[str]]) -> list[Optional[str]]:
+        """
+        Converts a chunk of timestamps - runs of equal timestamps are converted once.
+        Missing (`None`) timestamps stay `None`.
+        """
+        convert = self.convert
+        return [
+            convert(timestamp) if timestamp is not None else None
+            for timestamp in timestamps
+        ]
+
+    def _fallback(self, timestamp: str) -> str:
+        try:
+            dt = (
+                datetime.fromtimestamp(float(timestamp))
+                if self._unix
+                else datetime.strptime(timestamp, self.format)
+            )
+            return dt.isoformat() + "Z"  # Append 'Z' to indicate UTC
+        except ValueError as e:
+            raise ValueError(
+                f"Timestamp `{timestamp}` does not match format `{self.format}`: {e}"
+            )
+
+    def _convert_formatted(self, timestamp: str) -> str:
+        if self._pattern is None:
+            return self._fallback(timestamp)
+
+        if (
+            self._prefix is not None
+            and timestamp[: self._prefix_length] == self._prefix
+        ):
+            matched = self._tail_pattern.fullmatch(timestamp, self._prefix_length)  # type: ignore
+            if matched:
+                converted = self._format_time(matched.groupdict())
+                if converted:
+                    return self._iso_prefix + converted
+
+        matched = self._pattern.fullmatch(timestamp)
+        if matched is None:
+            return self._fallback(timestamp)
+
+        fields = matched.groupdict()
+        try:
+            if "short_year" in fields:
+                year = int(fields["short_year"])
+                year += 2000 if year <= 68 else 1900  # Same pivot as `strptime`.
+            else:
+                year = int(fields.get("year", 1900))
+
+            month = (
+                _MONTH_NAMES[fields["month_name"].lower()]
+                if "month_name" in fields
+                else int(fields.get("month", 1))
+            )
+            if (
+                "weekday_name" in fields
+                and fields["weekday_name"].lower() not in _WEEKDAY_NAMES
+            ):
+                return self._fallback(timestamp)
+
+            dt = datetime(
+                year,
+                month,
+                int(fields.get("day", 1)),
+                int(fields.get("hour", 0)),
+                int(fields.get("minute", 0)),
+                int(fields.get("second", 0)),
+                int(fields.get("fraction", "0").ljust(6, "0")),
+            )
+        except (KeyError, ValueError):
+            return self._fallback(timestamp)
+
+        converted = dt.isoformat() + "Z"
+        if self._tail_pattern is not None:
+            self._prefix = timestamp[: self._prefix_length]
+            self._iso_prefix = converted[:14]  # "YYYY-MM-DDTHH:"
+        return converted
+
+    @staticmethod
+    def _format_time(fields: dict[str, str]) -> Optional[str]:
+        minute = int(fields.get("minute", 0))
+        second = int(fields.get("second", 0))
+        if minute > 59 or second > 59:
+            return None  # Let the full parse (and `strptime`) handle it.
+
+        microsecond = int(fields.get("fraction", "0").ljust(6, "0"))
+        fraction = f".{microsecond:06d}" if microsecond else ""
+        return f"{minute:02d}:{second:02d}{fraction}Z"
+
+    def _convert_unix(self, timestamp: str) -> str:
+        if not (timestamp.isascii() and timestamp.isdigit()):
+            return self._fallback(timestamp)
+
+        seconds = int(timestamp)
+        hour_start = seconds - seconds % 3600
+        if hour_start != self._hour_start:
+            self._cache_hour(hour_start)
+
+        if self._hour_prefixes is None:
+            return self._fallback(timestamp)
+
+        # Local time (as `fromtimestamp` sees it) relative to the cached local hour.
+        local = self._hour_base_offset + seconds - hour_start
+        prefix = self._hour_prefixes[local // 3600]
+        local %= 3600
+        return f"{prefix}{local // 60:02d}:{local % 60:02d}Z"
+
+    def _cache_hour(self, hour_start: int):
+        self._hour_start = hour_start
+        self._hour_prefixes = None
+        try:
+            base = datetime.fromtimestamp(hour_start)
+            end = datetime.fromtimestamp(hour_start + 3599)
+        except (OverflowError, OSError, ValueError):
+            return
+
+        # Local UTC offset changes (DST) within the hour - leave those to `fromtimestamp`.
+        if end - base != timedelta(seconds=3599):
+            return
+
+        self._hour_base_offset = base.minute * 60 + base.second
+        next_hour = base + timedelta(seconds=3600 - self._hour_base_offset)
+        self._hour_prefixes = (base.isoformat()[:14], next_hour.isoformat()[:14])
@@ -1,6 +1,19 @@
-from . import functions, metrics_monitor
+from . import (
+    artifacts,
+    checkpoints,
+    columnar,
+    compression,
+    functions,
+    metrics_monitor,
+    writers,
+)
 
 __all__ = [
+    "artifacts",
+    "checkpoints",
+    "columnar",
+    "compression",
     "functions",
     "metrics_monitor",
+    "writers",
 ]
@@ -0,0 +1,173 @@
+"""
+Stage-level artifact cache of the pipeline (parsing -> features -> anomalies -> visualization).
+
+Every results directory has a manifest (`manifest.json`) of the artifacts its stage produced - the
+content hashes of their input files, a hash of the stage parameters they were produced with and
+the content hashes of their output files. An artifact is up to date (and skipped) while all of
+them are unchanged:
+    - only stages downstream of a change recompute - an upstream artifact recomputed into the
+      same content doesn't invalidate its downstream ones;
+    - content hashes are cached by the file's size and modification time, so unchanged
+      (multi-GB) files aren't read again;
+    - outputs an artifact no longer has (e.g. after a change of parameters) are removed, and so
+      are all outputs of artifacts a run no longer produces, or whose inputs are gone (see
+      `ArtifactManifest.prune`);
+    - manifests are written aside and renamed - an interrupted run never leaves a half-written
+      one, only artifacts it didn't get to record (which are recomputed).
+"""
+
+import hashlib
+import json
+import os
+from os.path import dirname, exists, join
+from typing import Any, Iterable, Optional
+
+from .checkpoints import config_hash
+
+MANIFEST_FILE = "manifest.json"
+HASH_CHUNK_SIZE = 1 << 20  # 1 MiB
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parameters_hash(parameters: Any) -> str:
+    # Parameters are JSON-serialized - anything else (e.g. paths, dataclasses) by `str`.
+    return config_hash(json.loads(json.dumps(parameters, sort_keys=True, default=str)))
+
+
+def _remove_output(path: str):
+    # Along with its directory (e.g. a dataset's), once empty.
+    if exists(path):
+        os.remove(path)
+    directory = dirname(path)
+    if directory and exists(directory) and not os.listdir(directory):
+        os.rmdir(directory)
+
+
+class ArtifactManifest:
+    def __init__(self, results_dir: str):
+        self.manifest_file = join(results_dir, MANIFEST_FILE)
+        self._artifacts: dict[str, dict[str, Any]] = {}
+        # Path -> size, modification time and content hash.
+        self._hashes: dict[str, dict[str, Any]] = {}
+        # Artifacts checked or recorded in this run - the others are pruned.
+        self._seen: set[str] = set()
+
+        if exists(self.manifest_file):
+            try:
+                with open(self.manifest_file, encoding="utf-8") as f:
+                    manifest = json.load(f)
+                self._artifacts = manifest["artifacts"]
+                self._hashes = manifest["hashes"]
+            except (ValueError, KeyError, TypeError):  # Corrupted or outdated manifest.
+                pass
+
+    def content_hash(self, path: str) -> Optional[str]:
+        """Content hash of a file - `None` if it doesn't exist."""
+        if not exists(path):
+            return None
+
+        stat = os.stat(path)
+        cached = self._hashes.get(path)
+        if (
+            cached is None
+            or cached["size"] != stat.st_size
+            or cached["mtime"] != stat.st_mtime_ns
+        ):
+            cached = self._hashes[path] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+                "hash": file_hash(path),
+            }
+        return cached["hash"]
+
+    def _hashes_of(self, paths: Iterable[str]) -> dict[str, Optional[str]]:
+        return {path: self.content_hash(path) for path in sorted(paths)}
+
+    def is_up_to_date(
+        self, artifact: str, input_files: Iterable[str], parameters: Any
+    ) -> bool:
+        """
+        Whether `artifact` was recorded with the same inputs and parameters, and its outputs are
+        still in place, unchanged.
+        """
+        self._seen.add(artifact)
+        recorded = self._artifacts.get(artifact)
+        if recorded is None or recorded["parameters"] != parameters_hash(parameters):
+            return False
+        if recorded["inputs"] != self._hashes_of(input_files):
+            return False
+
+        outputs = recorded["outputs"]
+        return all(
+            output_hash is not None and self.content_hash(path) == output_hash
+            for path, output_hash in outputs.items()
+        )
+
+    def record(
+        self,
+        artifact: str,
+        input_files: Iterable[str],
+        parameters: Any,
+        output_files: Iterable[str],
+    ):
+        """
+        Records (and saves) `artifact` as produced from `input_files` with `parameters` - its
+        previous outputs that aren't among `output_files` are removed, so downstream stages don't
+        pick up stale ones (e.g. dense matrices of a sparse artifact).
+        """
+        output_files = list(output_files)
+        previous = self._artifacts.get(artifact)
+        for path in previous["outputs"] if previous else []:
+            if path not in output_files:
+                _remove_output(path)
+
+        self._seen.add(artifact)
+        self._artifacts[artifact] = {
+            "inputs": self._hashes_of(input_files),
+            "parameters": parameters_hash(parameters),
+            "outputs": self._hashes_of(output_files),
+        }
+        self.save()
+
+    def prune(self, artifacts: Optional[Iterable[str]] = None) -> list[str]:
+        """
+        Drops (and saves the manifest without) artifacts that aren't among `artifacts` - the ones
+        checked or recorded in this run, by default - or whose inputs are gone, and removes their
+        outputs, so downstream stages don't pick up stale ones (e.g. matrices of windows no longer
+        produced). Returns the dropped artifacts.
+        """
+        kept = self._seen if artifacts is None else set(artifacts)
+        pruned = [
+            artifact
+            for artifact, recorded in self._artifacts.items()
+            if artifact not in kept
+            or not all(exists(path) for path in recorded["inputs"])
+        ]
+        if not pruned:
+            return pruned
+
+        for artifact in pruned:
+            for path in self._artifacts.pop(artifact)["outputs"]:
+                _remove_output(path)
+        self.save()
+        return pruned
+
+    def save(self):
+        os.makedirs(dirname(self.manifest_file) or os.curdir, exist_ok=True)
+        self._hashes = {
+            path: cached for path, cached in self._hashes.items() if exists(path)
+        }
+        # Written aside and renamed - a crash never leaves a half-written manifest.
+        temporary_file = f"{self.manifest_file}.tmp"
+        with open(temporary_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {"artifacts": self._artifacts, "hashes": self._hashes}, f, indent=4
+            )
+        os.replace(temporary_file, self.manifest_file)
@@ -0,0 +1,89 @@
+"""
+Byte-offset checkpoints of incremental processing of append-only log files.
+
+A checkpoint records how far a log file has been processed, a fingerprint of the processed part of
+the file and a hash of the processing configuration. Processing can resume from the recorded offset
+only if the file has merely grown since - a truncated or rewritten file, or a changed configuration
+requires a full rebuild.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from os.path import exists, getsize
+from typing import Any, Optional
+
+FINGERPRINT_BYTES = 1 << 16
+
+
+def config_hash(*config: Any) -> str:
+    return hashlib.sha256(json.dumps(config).encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(log_file: str, offset: int) -> str:
+    """Hash of the first and the last `FINGERPRINT_BYTES` of the first `offset` bytes of the file."""
+    digest = hashlib.sha256(str(offset).encode("utf-8"))
+    with open(log_file, "rb") as f:
+        digest.update(f.read(min(offset, FINGERPRINT_BYTES)))
+        f.seek(max(offset - FINGERPRINT_BYTES, 0))
+        digest.update(f.read(offset - f.tell()))
+    return digest.hexdigest()
+
+
+@dataclass
+class Checkpoint:
+    log_file: str
+    offset: int
+    fingerprint: str
+    config_hash: str
+    output_file: str
+    output_size: int
+    log_count: int
+    unmatched_count: int
+
+    @classmethod
+    def load(cls, checkpoint_file: str) -> Optional["Checkpoint"]:
+        if not exists(checkpoint_file):
+            return None
+
+        try:
+            with open(checkpoint_file, encoding="utf-8") as f:
+                return cls(**json.load(f))
+        except (ValueError, TypeError):  # Corrupted or outdated checkpoint.
+            return None
+
+    def save(self, checkpoint_file: str):
+        # Written aside and renamed - a crash never leaves a half-written checkpoint.
+        temporary_file = f"{checkpoint_file}.tmp"
+        with open(temporary_file, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, indent=4)
+        os.replace(temporary_file, checkpoint_file)
+
+    def resume_offset(
+        self, log_file: str, config_hash: str, output_file: str
+    ) -> Optional[int]:
+        """Offset to resume processing `log_file` from, `None` if the output has to be rebuilt."""
+        if (
+            self.log_file != log_file
+            or self.config_hash != config_hash
+            or self.output_file != output_file
+            or not exists(log_file)
+            or not exists(output_file)
+        ):
+            return None
+
+        size = getsize(log_file)
+        if size < self.offset or getsize(output_file) < self.output_size:
+            return None
+        if file_fingerprint(log_file, self.offset) != self.fingerprint:
+            return None
+
+        # Last processed line was incomplete and has been appended to since.
+        if 0 < self.offset < size:
+            with open(log_file, "rb") as f:
+                f.seek(self.offset - 1)
+                if f.read(1) != b"\n":
+                    return None
+
+        return self.offset
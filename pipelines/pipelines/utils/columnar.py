@@ -0,0 +1,161 @@
+"""
+Columnar (Parquet) storage of structured logs:
+    - typed columns - epoch-ns `int64` timestamps, dictionary-encoded low-cardinality strings;
+    - one row group per written batch;
+    - column projection on read.
+
+Requires the optional `pyarrow` dependency (`pip install pipelines[columnar]`).
+"""
+
+import os
+from typing import Any, Generator, Iterable, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Columnar output is optional.
+    pa = None
+    pq = None
+
+TIMESTAMP_COLUMNS = {"Timestamp"}
+# Drain3 cluster ids (`ids` encoding) and sizes of its templates table.
+INTEGER_COLUMNS = {"EventId", "Size"}
+DICTIONARY_COLUMNS = {"LogLevel", "Level", "Component", "EventTemplate"}
+LIST_COLUMNS = {"Parameters"}
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError(
+            "Parquet format requires `pyarrow` - install it with `pip install pyarrow`."
+        )
+
+
+def parquet_schema(fieldnames: Iterable[str]) -> "pa.Schema":
+    require_pyarrow()
+
+    fields = []
+    for name in fieldnames:
+        if name in TIMESTAMP_COLUMNS:
+            type = pa.int64()  # Nanoseconds since epoch (UTC).
+        elif name in INTEGER_COLUMNS:
+            type = pa.int64()
+        elif name in DICTIONARY_COLUMNS:
+            type = pa.dictionary(pa.int32(), pa.string())
+        elif name in LIST_COLUMNS:
+            type = pa.list_(pa.string())
+        else:
+            type = pa.string()
+        fields.append(pa.field(name, type))
+
+    return pa.schema(fields)
+
+
+def _timestamp_array(values: list[Any]) -> "pa.Array":
+    values = [None if value in ("", None) else value for value in values]
+    if all(value is None or isinstance(value, int) for value in values):
+        return pa.array(values, pa.int64())
+
+    # ISO-8601 strings, as produced by preprocessing.
+    return (
+        pa.array(values, pa.string())
+        .cast(pa.timestamp("ns", tz="UTC"))
+        .cast(pa.int64())
+    )
+
+
+def _column_array(values: list[Any], field: "pa.Field") -> "pa.Array":
+    if field.name in TIMESTAMP_COLUMNS:
+        return _timestamp_array(values)
+    if pa.types.is_dictionary(field.type):
+        return pa.array(values, pa.string()).dictionary_encode()
+    return pa.array(values, field.type)
+
+
+class ParquetBatchWriter:
+    extension = "parquet"
+
+    def __init__(self, path: str, fieldnames: list[str], append: bool = False):
+        self.schema = parquet_schema(fieldnames)
+        self._path = path
+        # Parquet files can't be appended to in place - existing row groups are copied into a new
+        # file, which replaces the old one only once it's complete.
+        self._temporary_path = f"{path}.tmp" if append else None
+        self._writer = pq.ParquetWriter(self._temporary_path or path, self.schema)
+        if append:
+            self.append_file(path)
+
+    def write_columns(self, columns: dict[str, list[Any]]):
+        """Writes a batch of columns as a single row group."""
+        arrays = [_column_array(columns[field.name], field) for field in self.schema]
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def write_rows(self, rows: list[dict[str, Any]]):
+        if rows:
+            self.write_columns(
+                {name: [row.get(name) for row in rows] for name in self.schema.names}
+            )
+
+    def append_file(self, path: str):
+        """Appends (row group by row group) a Parquet file written with the same schema."""
+        parquet_file = pq.ParquetFile(path)
+        for i in range(parquet_file.num_row_groups):
+            self._writer.write_table(parquet_file.read_row_group(i))
+
+    def close(self):
+        self._writer.close()
+        if self._temporary_path:
+            os.replace(self._temporary_path, self._path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+def read_parquet(
+    parquet_file: str, columns: Optional[list[str]] = None
+) -> "pd.DataFrame":
+    """Reads a Parquet file into a DataFrame - nullable timestamps stay `Int64` (not float)."""
+    require_pyarrow()
+
+    return pq.read_table(parquet_file, columns=columns).to_pandas(
+        types_mapper={pa.int64(): pd.Int64Dtype()}.get
+    )
+
+
+def parquet_columns(parquet_file: str) -> list[str]:
+    """Column names of a Parquet file - read from its schema alone."""
+    require_pyarrow()
+
+    return pq.read_schema(parquet_file).names
+
+
+def parquet_dict_generator(
+    parquet_file: str,
+    columns: Optional[list[str]] = None,
+    batch_size: int = 10000,
+) -> Generator[dict[str, Any], None, None]:
+    require_pyarrow()
+
+    for batch in pq.ParquetFile(parquet_file).iter_batches(
+        batch_size=batch_size, columns=columns
+    ):
+        yield from batch.to_pylist()
+
+
+def parquet_chunk_generator(
+    parquet_file: str,
+    columns: Optional[list[str]] = None,
+    batch_size: int = 1000000,
+) -> Generator["pd.DataFrame", None, None]:
+    """Reads a Parquet file in DataFrames of (at most) `batch_size` rows - see `read_parquet`."""
+    require_pyarrow()
+
+    for batch in pq.ParquetFile(parquet_file).iter_batches(
+        batch_size=batch_size, columns=columns
+    ):
+        yield batch.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
@@ -0,0 +1,256 @@
+"""
+Streaming decompression of compressed log files - `.gz`, `.bz2`, `.xz` and tar archives thereof:
+    - decompression runs in a background thread, overlapped with parsing (`zlib`, `bz2` and `lzma`
+      release the GIL while decompressing);
+    - BGZF (blocked, multi-member gzip, as written by `bgzip`) is decompressed block by block in a
+      thread pool - other gzip files have no member index and are decompressed sequentially;
+    - tar archives are read as a stream - their regular members are concatenated.
+"""
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import struct
+import tarfile
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from os.path import exists
+from typing import Any, Generator, Iterator, Optional
+
+BLOCK_SIZE = 1 << 20  # 1 MiB
+# Decompressed blocks buffered ahead of the consumer.
+PREFETCH_BLOCKS = 8
+
+# Longest suffixes first - `.tar.gz` is a tar archive, not a gzip-compressed log.
+COMPRESSED_EXTENSIONS = {
+    ".tar.gz": "tar",
+    ".tgz": "tar",
+    ".tar.bz2": "tar",
+    ".tar.xz": "tar",
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+}
+
+_GZIP_MAGIC = b"\x1f\x8b\x08"
+_GZIP_FEXTRA = 0x04
+_BGZF_HEADER = struct.Struct("<3xB6xH")  # FLG, XLEN of the gzip header.
+
+
+def compression(log_file: str) -> Optional[str]:
+    """Compression of a log file (by its extension), `None` for plain files."""
+    for extension, kind in COMPRESSED_EXTENSIONS.items():
+        if log_file.endswith(extension):
+            return kind
+    return None
+
+
+def is_compressed(log_file: str) -> bool:
+    return compression(log_file) is not None
+
+
+def strip_compression_extension(log_file: str) -> str:
+    for extension in COMPRESSED_EXTENSIONS:
+        if log_file.endswith(extension):
+            return log_file[: -len(extension)]
+    return log_file
+
+
+def find_log_file(log_file: str) -> str:
+    """`log_file` if it exists, otherwise its first existing compressed variant (e.g. `X.log.gz`)."""
+    if exists(log_file):
+        return log_file
+
+    for extension in COMPRESSED_EXTENSIONS:
+        if exists(log_file + extension):
+            return log_file + extension
+    return log_file
+
+
+def _bgzf_header(f: io.BufferedIOBase) -> tuple[bytes, Optional[int]]:
+    """
+    Reads a gzip member header, returns it along with the BGZF block size (`None` if it's not
+    a BGZF block).
+    """
+    header = f.read(_BGZF_HEADER.size)
+    if len(header) < _BGZF_HEADER.size or not header.startswith(_GZIP_MAGIC):
+        return header, None
+
+    flags, extra_length = _BGZF_HEADER.unpack(header)
+    if not flags & _GZIP_FEXTRA:
+        return header, None
+
+    # Extra field subfields - `BC` holds the block size, minus one.
+    extra = f.read(extra_length)
+    position = 0
+    while position + 4 <= len(extra):
+        subfield_length = int.from_bytes(extra[position + 2 : position + 4], "little")
+        if extra[position : position + 2] == b"BC" and subfield_length == 2:
+            block_size = int.from_bytes(extra[position + 4 : position + 6], "little")
+            return header + extra, block_size + 1
+        position += 4 + subfield_length
+    return header + extra, None
+
+
+def _bgzf_blocks(log_file: str, threads: int) -> Generator[bytes, Any, Any]:
+    """Decompressed BGZF blocks, in order - up to `2 * threads` blocks are decompressed ahead."""
+    with open(log_file, "rb") as f, ThreadPoolExecutor(max_workers=threads) as executor:
+        pending: deque = deque()
+        while True:
+            header, block_size = _bgzf_header(f)
+            if not header:
+                break
+            if block_size is None or block_size < len(header):
+                raise ValueError(f"Log file '{log_file}' isn't a BGZF file.")
+
+            block = header + f.read(block_size - len(header))
+            pending.append(executor.submit(zlib.decompress, block, 31))
+            if len(pending) >= 2 * threads:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def _file_blocks(file: io.BufferedIOBase) -> Generator[bytes, Any, Any]:
+    while block := file.read(BLOCK_SIZE):
+        yield block
+
+
+def _tar_blocks(log_file: str) -> Generator[bytes, Any, Any]:
+    with tarfile.open(log_file, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+
+            last_block = b""
+            for last_block in _file_blocks(archive.extractfile(member)):
+                yield last_block
+            # Members are concatenated - the last line of a member mustn't run into the next one.
+            if last_block and not last_block.endswith(b"\n"):
+                yield b"\n"
+
+
+def is_bgzf(log_file: str) -> bool:
+    with open(log_file, "rb") as f:
+        return _bgzf_header(f)[1] is not None
+
+
+def decompressed_blocks(
+    log_file: str, threads: Optional[int] = None
+) -> Generator[bytes, Any, Any]:
+    """Decompressed content of a compressed log file, in blocks."""
+    kind = compression(log_file)
+    if kind == "tar":
+        yield from _tar_blocks(log_file)
+    elif kind == "gzip" and is_bgzf(log_file):
+        yield from _bgzf_blocks(log_file, threads or os.cpu_count() or 1)
+    else:
+        opener = {"gzip": gzip.open, "bz2": bz2.open, "xz": lzma.open}[kind]
+        with opener(log_file, "rb") as f:
+            yield from _file_blocks(f)
+
+
+_END = object()
+
+
+class PrefetchedStream(io.RawIOBase):
+    """
+    Binary stream of blocks produced by a background thread - at most `depth` blocks ahead.
+
+    Errors of the producer are raised by the consumer. Closing the stream early stops the producer.
+    """
+
+    def __init__(self, blocks: Iterator[bytes], depth: int = PREFETCH_BLOCKS):
+        self._blocks = blocks
+        self._queue: queue.Queue = queue.Queue(maxsize=depth)
+        self._stopped = threading.Event()
+        self._block = memoryview(b"")
+        self._exhausted = False
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def _put(self, item: Any) -> bool:
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        try:
+            for block in self._blocks:
+                if not self._put(block):
+                    return
+            self._put(_END)
+        except BaseException as error:
+            self._put(error)
+        finally:
+            close = getattr(self._blocks, "close", None)
+            if close:
+                close()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._block:
+            if self._exhausted:
+                return 0
+
+            item = self._queue.get()
+            if item is _END:
+                self._exhausted = True
+                return 0
+            if isinstance(item, BaseException):
+                self._exhausted = True
+                raise item
+            self._block = memoryview(item)
+
+        size = min(len(buffer), len(self._block))
+        buffer[:size] = self._block[:size]
+        self._block = self._block[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self._stopped.set()
+            # Unblocks the producer, if it's waiting on a full queue.
+            while self._thread.is_alive():
+                try:
+                    self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self._thread.join()
+        super().close()
+
+
+def open_decompressed(log_file: str, threads: Optional[int] = None) -> io.TextIOWrapper:
+    """
+    Opens a compressed log file as a text stream, decompressed in the background.
+
+    Lines are the same (universal newlines, default encoding) as of the decompressed file opened
+    in text mode.
+    """
+    if not exists(log_file):
+        raise ValueError(f"Log file '{log_file}' doesn't exist.")
+
+    return io.TextIOWrapper(
+        io.BufferedReader(
+            PrefetchedStream(decompressed_blocks(log_file, threads)), BLOCK_SIZE
+        )
+    )
+
+
+def open_log(log_file: str, threads: Optional[int] = None) -> io.TextIOWrapper:
+    """Opens a plain or compressed log file in text mode."""
+    if is_compressed(log_file):
+        return open_decompressed(log_file, threads)
+    return open(log_file)
@@ -1,10 +1,24 @@
 import csv
+import io
+import mmap
 import os
 from os.path import basename, exists, join, splitext
-from typing import Any, Generator
+from time import perf_counter
+from typing import Any, Generator, Optional
 
 import pandas as pd
 
+from .columnar import (
+    parquet_chunk_generator,
+    parquet_columns,
+    parquet_dict_generator,
+    read_parquet,
+)
+from .compression import is_compressed, open_decompressed, strip_compression_extension
+from .writers import OUTPUT_FORMATS
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
 
 def get_all_files_recursively(directory: str) -> list[str]:
     file_list = []
@@ -14,23 +28,141 @@ def get_all_files_recursively(directory: str) -> list[str]:
     return file_list
 
 
+def get_structured_files_recursively(directory: str) -> list[str]:
+    """CSV and Parquet files of structured logs - not checkpoints or manifests beside them."""
+    return [
+        file
+        for file in get_all_files_recursively(directory)
+        if splitext(file)[1][1:] in OUTPUT_FORMATS
+    ]
+
+
 def get_dataset_name(filepath: str) -> str:
-    return os.path.splitext(basename(filepath))[0]
+    return os.path.splitext(basename(strip_compression_extension(filepath)))[0]
 
 
-def dataset_to_csv(df: pd.DataFrame, results_dir, dataset_name: str):
+def dataset_to_csv(df: pd.DataFrame, results_dir, dataset_name: str) -> str:
     features_results_dir = join(results_dir, dataset_name)
     os.makedirs(features_results_dir, exist_ok=True)
-    df.to_csv(join(features_results_dir, f"{dataset_name}.csv"))
+    result_file = join(features_results_dir, f"{dataset_name}.csv")
+    df.to_csv(result_file)
+    return result_file
+
+
+def log_generator(
+    log_file: str, start: int = 0, end: Optional[int] = None
+) -> Generator[str, Any, Any]:
+    if not exists(log_file):
+        raise ValueError(f"Log file '{log_file}' doesn't exist.")
+
+    if is_compressed(log_file):
+        if start != 0 or end is not None:
+            raise ValueError(
+                f"Byte ranges of compressed log file '{log_file}' can't be read."
+            )
+        # Decompressed in a background thread, while the lines are consumed.
+        with open_decompressed(log_file) as f:
+            for line in f:
+                yield line
+        return
+
+    if start == 0 and end is None:
+        # Buffered text mode is the fastest way to read a whole file line by line (see `reader_report`).
+        with open(log_file) as f:
+            for line in f:
+                yield line
+        return
 
+    # Same (universal) newline handling as text mode.
+    for chunk in log_chunks(log_file, start, end):
+        yield from io.StringIO(chunk, newline=None)
 
-def log_generator(log_file: str) -> Generator[str, Any, Any]:
+
+def log_chunks(
+    log_file: str,
+    start: int = 0,
+    end: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Generator[str, Any, Any]:
+    """
+    Decoded chunks of whole lines of the byte range `[start, end)`, read through `mmap`.
+
+    Chunks end right after a newline (or at the end of the range), so multi-byte characters and
+    `\r\n` pairs are never split. Offsets are expected to be line-aligned (see `split_file`).
+    """
     if not exists(log_file):
         raise ValueError(f"Log file '{log_file}' doesn't exist.")
 
-    with open(log_file) as f:
-        for line in f:
-            yield line
+    with open(log_file, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size if end is None else min(end, size)
+        if start >= end:
+            return  # Also, empty files can't be mapped.
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            position = start
+            while position < end:
+                chunk_end = min(position + chunk_size, end)
+                if chunk_end < end:
+                    newline = mapped.rfind(b"\n", position, chunk_end)
+                    if newline < 0:  # Line longer than a chunk.
+                        newline = mapped.find(b"\n", chunk_end, end)
+                    chunk_end = newline + 1 if newline >= 0 else end
+
+                yield mapped[position:chunk_end].decode("utf-8")
+                position = chunk_end
+
+
+def reader_report(log_file: str) -> dict[str, Any]:
+    """
+    Microbenchmark of reading `log_file` - whole-file text lines, `mmap` range lines and chunks.
+
+    Compressed files only have (decompressed) text lines, measured against the compressed size.
+    """
+    size = os.path.getsize(log_file)
+    readers = {"Text lines": lambda: log_generator(log_file)}
+    if not is_compressed(log_file):
+        readers["Range lines"] = lambda: log_generator(log_file, 0, size)
+        readers["Chunks"] = lambda: log_chunks(log_file)
+
+    report: dict[str, Any] = {"Size (MB)": round(size / 2**20, 4)}
+    for label, reader in readers.items():
+        start = perf_counter()
+        for _ in reader():
+            pass
+        report[f"{label} [MB/sec]"] = round(size / 2**20 / (perf_counter() - start), 4)
+
+    return report
+
+
+def split_file(
+    log_file: str, parts: int, start: int = 0, end: Optional[int] = None
+) -> list[tuple[int, int]]:
+    """
+    Splits a file (or its line-aligned byte range `[start, end)`) into (at most) `parts` byte ranges
+    of roughly equal size.
+
+    Every range starts at the beginning of a line and ends right after a newline (or at EOF),
+    so ranges can be processed independently and their results concatenated in order.
+    """
+    if not exists(log_file):
+        raise ValueError(f"Log file '{log_file}' doesn't exist.")
+
+    end = os.path.getsize(log_file) if end is None else end
+    boundaries = [start]
+
+    with open(log_file, "rb") as f:
+        for part in range(1, parts):
+            f.seek(max(start + (end - start) * part // parts, boundaries[-1]))
+            f.readline()  # Move to the start of the next line.
+            offset = f.tell()
+            if offset >= end:
+                break
+            if offset > boundaries[-1]:
+                boundaries.append(offset)
+
+    boundaries.append(end)
+    return list(zip(boundaries[:-1], boundaries[1:]))
 
 
 def csv_dict_generator(csv_file: str) -> Generator[dict[str, Any], None, None]:
@@ -41,3 +173,43 @@ def csv_dict_generator(csv_file: str) -> Generator[dict[str, Any], None, None]:
         reader = csv.DictReader(f)
         for row in reader:
             yield row
+
+
+def structured_log_generator(file: str) -> Generator[dict[str, Any], None, None]:
+    """Iterates structured logs (rows) of a CSV or Parquet file."""
+    if splitext(file)[1] == ".parquet":
+        if not exists(file):
+            raise ValueError(f"Parquet file '{file}' doesn't exist.")
+        return parquet_dict_generator(file)
+
+    return csv_dict_generator(file)
+
+
+def structured_columns(file: str) -> list[str]:
+    """Column names of a CSV or Parquet file of structured logs - no rows are read."""
+    if splitext(file)[1] == ".parquet":
+        return parquet_columns(file)
+
+    return list(pd.read_csv(file, nrows=0).columns)
+
+
+def read_structured(file: str, columns: Optional[list[str]] = None) -> pd.DataFrame:
+    """Reads (only the given `columns` of) a CSV or Parquet file of structured logs."""
+    if splitext(file)[1] == ".parquet":
+        return read_parquet(file, columns=columns)
+
+    return pd.read_csv(file, usecols=columns)
+
+
+def structured_chunk_generator(
+    file: str, columns: Optional[list[str]] = None, chunk_size: int = 1000000
+) -> Generator[pd.DataFrame, None, None]:
+    """Reads (only the given `columns` of) a CSV or Parquet file of structured logs in chunks."""
+    if splitext(file)[1] == ".parquet":
+        if not exists(file):
+            raise ValueError(f"Parquet file '{file}' doesn't exist.")
+        yield from parquet_chunk_generator(file, columns, chunk_size)
+        return
+
+    with pd.read_csv(file, usecols=columns, chunksize=chunk_size) as reader:
+        yield from reader
@@ -6,7 +6,7 @@ import psutil
 
 
 class MetricsMonitor:
-    def __init__(self):
+    def __init__(self, include_children: bool = False):
         self._start_time = None
         self._end_time = None
         self._log_count = 0
@@ -15,11 +15,30 @@ class MetricsMonitor:
         self._monitoring = False
         self._monitor_thread = None
         self._process = psutil.Process()
+        # Worker processes (e.g. process pools) are sampled alongside the main process.
+        self._include_children = include_children
+        self._children: dict[int, psutil.Process] = {}
+
+    def _sample_children(self) -> tuple[float, float]:
+        mem, cpu = 0.0, 0.0
+        for child in self._process.children(recursive=True):
+            # Same `Process` object has to be reused, `cpu_percent` is measured between calls.
+            process = self._children.setdefault(child.pid, child)
+            try:
+                mem += process.memory_info().rss / (1024 * 1024)
+                cpu += process.cpu_percent(interval=None)
+            except psutil.NoSuchProcess:
+                self._children.pop(child.pid, None)
+        return mem, cpu
 
     def _monitor(self):
         while self._monitoring:
             mem = self._process.memory_info().rss / (1024 * 1024)  # Convert to MB
             cpu = self._process.cpu_percent(interval=0.1)
+            if self._include_children:
+                children_mem, children_cpu = self._sample_children()
+                mem += children_mem
+                cpu += children_cpu
             self._max_memory = max(self._max_memory, mem)
             self._max_cpu = max(self._max_cpu, cpu)
             sleep(0.1)
@@ -31,6 +50,7 @@ class MetricsMonitor:
         self._log_count = 0
         self._max_memory = 0
         self._max_cpu = 0
+        self._children = {}
         self._monitor_thread = Thread(target=self._monitor)
         self._monitor_thread.start()
 
@@ -0,0 +1,87 @@
+"""
+Batched writers of structured logs - one `write_rows` (dictionaries) or `write_columns` call per batch:
+    - CSV (default) - untyped, `csv.DictWriter`/`csv.writer`;
+    - Parquet - typed columns, see `columnar`.
+"""
+
+import csv
+import shutil
+from typing import Any, Optional, Union
+
+from .columnar import ParquetBatchWriter, require_pyarrow
+
+OUTPUT_FORMATS = ("csv", "parquet")
+
+
+class CsvBatchWriter:
+    extension = "csv"
+
+    def __init__(
+        self,
+        path: str,
+        fieldnames: list[str],
+        write_header: bool = True,
+        append: bool = False,
+    ):
+        self.fieldnames = fieldnames
+        self._file = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        self._columns_writer = csv.writer(self._file)
+        if write_header and not append:
+            self._writer.writeheader()
+
+    def write_rows(self, rows: list[dict[str, Any]]):
+        self._writer.writerows(rows)
+
+    def write_columns(self, columns: dict[str, list[Optional[Any]]]):
+        """Writes a batch of columns - `None` values are written as empty fields."""
+        self._columns_writer.writerows(
+            zip(*(columns[name] for name in self.fieldnames))
+        )
+
+    def append_file(self, path: str):
+        """Appends a header-less CSV file written with the same fieldnames."""
+        with open(path, newline="", encoding="utf-8") as f:
+            shutil.copyfileobj(f, self._file)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+
+BatchWriter = Union[CsvBatchWriter, ParquetBatchWriter]
+
+
+def output_path(path_without_extension: str, output_format: str) -> str:
+    return f"{path_without_extension}.{output_format}"
+
+
+def open_batch_writer(
+    path: str,
+    fieldnames: list[str],
+    output_format: str = "csv",
+    write_header: bool = True,
+    append: bool = False,
+) -> BatchWriter:
+    """
+    Opens a writer for `path` in the given format - `append` continues an existing file.
+
+    `write_header` only applies to CSV - header-less CSV files are used as shards,
+    to be concatenated with `append_file`.
+    """
+    if output_format == "csv":
+        return CsvBatchWriter(
+            path, fieldnames, write_header=write_header, append=append
+        )
+    if output_format == "parquet":
+        require_pyarrow()
+        return ParquetBatchWriter(path, fieldnames, append=append)
+
+    raise ValueError(
+        f"Unknown output format `{output_format}`, expected one of {OUTPUT_FORMATS}."
+    )
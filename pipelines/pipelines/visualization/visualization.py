@@ -1,8 +1,11 @@
+import argparse
 from os import makedirs, pardir
-from os.path import dirname, exists, join
+from os.path import basename, dirname, exists, join
+from typing import Optional
 
 import pandas as pd
 
+from ..utils.artifacts import ArtifactManifest
 from ..utils.functions import get_all_files_recursively, get_dataset_name
 from .plots import (
     plot_event_correlation,
@@ -25,7 +28,7 @@ def create_plots(anomaly_results_path, output_dir=None):
         output_dir (str, optional): Directory to save visualization outputs
 
     Returns:
-        dict: Dictionary containing anomaly statistics
+        list: Paths of the saved plots (none, without `output_dir`)
     """
     anomaly_df = pd.read_csv(anomaly_results_path, index_col=0)
 
@@ -44,21 +47,33 @@ def create_plots(anomaly_results_path, output_dir=None):
     if output_dir and not exists(output_dir):
         makedirs(output_dir, exist_ok=True)
 
+    plot_files: list[str] = []
+
+    def plot_file(name: str) -> Optional[str]:
+        if not output_dir:
+            return None
+        plot_files.append(join(output_dir, name))
+        return plot_files[-1]
+
     plot_timeseries(
         anomaly_df,
         time_based_index,
-        join(output_dir, "anomaly_scores_timeseries.png") if output_dir else None,
+        plot_file("anomaly_scores_timeseries.png"),
     )
 
     plot_histogram(
         anomaly_scores,
-        join(output_dir, "anomaly_scores_histogram.png") if output_dir else None,
+        plot_file("anomaly_scores_histogram.png"),
     )
 
+    # Results of sparse event count matrices only have scores - no event counts to plot.
+    if event_count_matrix.empty:
+        return plot_files
+
     plot_event_heatmap(
         event_count_matrix,
         time_based_index,
-        join(output_dir, "event_heatmap.png") if output_dir else None,
+        plot_file("event_heatmap.png"),
     )
 
     # t-SNE visualization if we have enough data points.
@@ -67,29 +82,61 @@ def create_plots(anomaly_results_path, output_dir=None):
             event_count_matrix,
             anomaly_scores,
             is_anomaly,
-            join(output_dir, "tsne_visualization.png") if output_dir else None,
+            plot_file("tsne_visualization.png"),
         )
 
     plot_event_correlation(
         event_count_matrix,
         anomaly_scores,
-        join(output_dir, "event_correlation.png") if output_dir else None,
+        plot_file("event_correlation.png"),
+    )
+
+    return plot_files
+
+
+def get_parser():
+    """Visualization of anomaly detection results."""
+    parser = argparse.ArgumentParser(description=get_parser.__doc__)
+
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Plot all results - even the up-to-date ones (see `artifacts`).",
     )
 
+    return parser
+
+
+def main(args: Optional[argparse.Namespace] = None):
+    if not args:
+        args = get_parser().parse_args()
+
+    manifest = ArtifactManifest(RESULTS_DIR)
 
-def main():
     for input_file in get_all_files_recursively(INPUT_DIR):
         dataset_name = get_dataset_name(input_file)
+        # Manifests aren't results.
+        if basename(dirname(input_file)) != dataset_name:
+            continue
         input_file = join(INPUT_DIR, dataset_name, f"{dataset_name}.csv")
 
         if not exists(input_file):
             print(f"Anomaly detection results not found at: `{input_file}`")
             continue
 
+        if not args.force and manifest.is_up_to_date(dataset_name, [input_file], {}):
+            print(f"Plots of `{dataset_name}` are up to date")
+            continue
+
         dataset_result_dir = join(RESULTS_DIR, dataset_name)
         makedirs(dataset_result_dir, exist_ok=True)
 
-        create_plots(input_file, dataset_result_dir)
+        # Only the plots of this run - stale ones (e.g. of a dense matrix) are removed.
+        plot_files = create_plots(input_file, dataset_result_dir)
+        manifest.record(dataset_name, [input_file], {}, plot_files)
+
+    for dataset_name in manifest.prune():
+        print(f"Stale plots of `{dataset_name}` removed")
 
 
 if __name__ == "__main__":
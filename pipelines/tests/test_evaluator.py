@@ -0,0 +1,61 @@
+import random
+import unittest
+
+import numpy as np
+import pandas as pd
+from logparser.utils import evaluator as logparser_evaluator
+
+from pipelines.parsing.drain import evaluator
+
+LOG_COUNT = 2000
+
+
+def parsing_results(seed: int) -> tuple[pd.Series, pd.Series]:
+    """
+    Ground truth event ids of random logs, and parsed ones - with some ground truth events merged,
+    some split, and logs of half of the events sometimes assigned to random events or unparsed.
+    """
+    rng = random.Random(seed)
+    groundtruth = [f"E{rng.randrange(40)}" for _ in range(LOG_COUNT)]
+
+    merged = {f"E{i}": f"E{rng.randrange(40)}" for i in range(0, 40, 7)}
+    split = {f"E{i}" for i in range(3, 40, 11)}
+    noisy = {f"E{i}" for i in range(0, 40, 2)}
+    parsed = []
+    for event_id in groundtruth:
+        draw = rng.random() if event_id in noisy else 1.0
+        if draw < 0.02:
+            parsed.append(np.nan)
+        elif draw < 0.05:
+            parsed.append(f"P{rng.randrange(60)}")
+        elif event_id in split:
+            parsed.append(f"P{event_id}-{rng.randrange(2)}")
+        else:
+            parsed.append(f"P{merged.get(event_id, event_id)}")
+
+    return pd.Series(groundtruth), pd.Series(parsed)
+
+
+class GetAccuracyTest(unittest.TestCase):
+    def assert_same_accuracy(self, groundtruth: pd.Series, parsed: pd.Series):
+        expected = logparser_evaluator.get_accuracy(groundtruth, parsed)
+        actual = evaluator.get_accuracy(groundtruth, parsed)
+        for name, actual_value, expected_value in zip(
+            ("precision", "recall", "f_measure", "accuracy"), actual, expected
+        ):
+            self.assertAlmostEqual(actual_value, expected_value, msg=name)
+
+    def test_matches_logparser(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                self.assert_same_accuracy(*parsing_results(seed))
+
+    def test_perfect_parsing(self):
+        groundtruth, _ = parsing_results(0)
+        parsed = groundtruth.map(lambda event_id: f"P{event_id}")
+        self.assert_same_accuracy(groundtruth, parsed)
+        self.assertEqual(evaluator.get_accuracy(groundtruth, parsed)[3], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import random
+import unittest
+from os.path import join
+from tempfile import TemporaryDirectory
+
+import pandas as pd
+
+from pipelines.parsing.drain3.drain3 import (
+    load_config,
+    mine_templates,
+    write_mined_logs,
+)
+from pipelines.parsing.drain3.sharded import mine_sharded
+from pipelines.parsing.drain3.snapshots import create_template_miner
+
+LOG_COUNT = 5000
+WORDS = [
+    f"{prefix}{suffix}"
+    for prefix in ("block", "packet", "session", "thread", "request")
+    for suffix in ("sent", "received", "opened", "closed", "failed", "queued")
+]
+
+
+def write_structured_logs(input_file: str, template_count: int, seed: int = 0):
+    """
+    Structured logs (just `LineId` and `Content`) of random templates of 3 to 12 tokens - numbers
+    (masked) and words (generalized by later logs) as their parameters.
+    """
+    rng = random.Random(seed)
+    templates = [
+        [rng.choice(WORDS) for _ in range(rng.randrange(3, 13))]
+        for _ in range(template_count)
+    ]
+
+    contents = []
+    for _ in range(LOG_COUNT):
+        tokens = list(rng.choice(templates))
+        position = rng.randrange(len(tokens))
+        tokens[position] = rng.choice([str(rng.randrange(1000)), rng.choice(WORDS)])
+        contents.append(" ".join(tokens))
+    pd.DataFrame(
+        {"LineId": range(1, LOG_COUNT + 1), "Content": contents}
+    ).to_csv(input_file, index=False)
+
+
+class ShardedMiningTest(unittest.TestCase):
+    def mine(self, input_file: str, shards: int, results_dir: str):
+        # The repo's configuration - `max_clusters` included.
+        template_miner = create_template_miner(load_config())
+        result_file = join(results_dir, f"result_{shards}.csv")
+        templates_file = join(results_dir, f"templates_{shards}.csv")
+
+        if shards > 1:
+            mined_logs = mine_sharded(
+                template_miner, input_file, shards, spill_dir=results_dir
+            )
+            write_mined_logs(
+                template_miner,
+                input_file,
+                lambda _: next(mined_logs),
+                result_file,
+                templates_file=templates_file,
+            )
+        else:
+            mine_templates(
+                template_miner, input_file, result_file, templates_file=templates_file
+            )
+
+        return template_miner, pd.read_csv(result_file), pd.read_csv(templates_file)
+
+    def assert_shards_match_single_process(self, template_count: int):
+        with TemporaryDirectory() as results_dir:
+            input_file = join(results_dir, "logs.csv")
+            write_structured_logs(input_file, template_count)
+
+            miner, results, templates = self.mine(input_file, 1, results_dir)
+            self.cluster_count = miner.drain.clusters_counter
+            for shards in (2, 4):
+                with self.subTest(shards=shards):
+                    sharded_miner, sharded_results, sharded_templates = self.mine(
+                        input_file, shards, results_dir
+                    )
+
+                    pd.testing.assert_frame_equal(sharded_results, results)
+                    pd.testing.assert_frame_equal(sharded_templates, templates)
+
+                    # Same clusters, in the same (LRU) order - the saved state is the same.
+                    drain = miner.drain
+                    sharded_drain = sharded_miner.drain
+                    self.assertEqual(
+                        list(sharded_drain.id_to_cluster.keys()),
+                        list(drain.id_to_cluster.keys()),
+                    )
+                    self.assertEqual(
+                        [
+                            (cluster.get_template(), cluster.size)
+                            for cluster in sharded_drain.id_to_cluster.values()
+                        ],
+                        [
+                            (cluster.get_template(), cluster.size)
+                            for cluster in drain.id_to_cluster.values()
+                        ],
+                    )
+                    self.assertEqual(
+                        sharded_drain.clusters_counter, drain.clusters_counter
+                    )
+
+    def test_shards_match_single_process(self):
+        self.assert_shards_match_single_process(template_count=80)
+        self.assertLessEqual(self.cluster_count, load_config().drain_max_clusters)
+
+    def test_shards_evicting_clusters_match_single_process(self):
+        # More clusters than `max_clusters` - mined in one process (see `sharded`).
+        self.assert_shards_match_single_process(template_count=400)
+        self.assertGreater(self.cluster_count, load_config().drain_max_clusters)
+
+
+if __name__ == "__main__":
+    unittest.main()